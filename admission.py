@@ -0,0 +1,139 @@
+"""Admission control for searches and OCR jobs under concurrent load.
+
+An ``AdmissionController`` lets at most ``max_active`` holders run at once
+and queues the rest first in, first out; each waiting ``Ticket`` knows its
+place in the queue so the UI can show it. Once ``max_queued`` callers are
+already waiting, new ones are turned away with ``Overloaded``.
+"""
+import threading
+from collections import deque
+
+from metrics import metrics
+
+# How often a queued caller checks its cancel token, in seconds
+_CANCEL_POLL_SECONDS = 0.1
+
+
+class Overloaded(RuntimeError):
+    """Raised when a queue is full and the request is shed."""
+
+
+class Ticket:
+    """A caller's place in an ``AdmissionController`` queue.
+
+    ``backlog`` is how many callers were already waiting when it was issued.
+    """
+
+    def __init__(self, controller, backlog):
+        self.controller = controller
+        self.backlog = backlog
+        self.admitted = False
+        self.released = False
+
+    @property
+    def position(self):
+        """1-based place in the queue, or ``None`` once admitted or released."""
+        return self.controller._position(self)
+
+    def wait(self, cancel=None, on_position=None):
+        """Block until admitted; return ``False`` if cancelled or released first.
+
+        The wait ends early when ``cancel`` is set or another thread releases
+        the ticket. ``on_position(position)`` is called whenever the place in
+        the queue changes while waiting.
+        """
+        return self.controller._wait(self, cancel, on_position)
+
+    def release(self):
+        """Free the slot (or leave the queue); safe to call more than once."""
+        self.controller._release(self)
+
+
+class AdmissionController:
+    """Bounds how many callers run at once and how many may wait for a slot."""
+
+    def __init__(self, name, max_active, max_queued=None):
+        self.name = name
+        self.max_active = max(1, max_active)
+        self.max_queued = max_queued
+        self.active = 0
+        self._waiting = deque()
+        self._condition = threading.Condition()
+
+    @property
+    def queued(self):
+        with self._condition:
+            return len(self._waiting)
+
+    @property
+    def full(self):
+        """Whether a new caller would be shed right now."""
+        with self._condition:
+            return self._full()
+
+    def _full(self):
+        # Only callers that would have to wait are shed
+        return (
+            self.max_queued is not None
+            and self.active >= self.max_active
+            and len(self._waiting) >= self.max_queued
+        )
+
+    def enter(self):
+        """Return a ``Ticket`` at the back of the queue, admitted at once if a slot is free.
+
+        Raises ``Overloaded`` when no slot is free and ``max_queued`` callers
+        are already waiting.
+        """
+        with self._condition:
+            if self._full():
+                metrics.increment(f"{self.name}_shed")
+                raise Overloaded(f"Too many {self.name} requests queued; try again shortly")
+            ticket = Ticket(self, backlog=len(self._waiting))
+            self._waiting.append(ticket)
+            self._admit()
+            return ticket
+
+    def _admit(self):
+        # Called with the condition held
+        while self._waiting and self.active < self.max_active:
+            ticket = self._waiting.popleft()
+            ticket.admitted = True
+            self.active += 1
+        metrics.set(f"{self.name}_active", self.active)
+        metrics.set(f"{self.name}_queued", len(self._waiting))
+        self._condition.notify_all()
+
+    def _position(self, ticket):
+        with self._condition:
+            if ticket.admitted or ticket.released:
+                return None
+            return self._waiting.index(ticket) + 1
+
+    def _wait(self, ticket, cancel, on_position):
+        last_position = None
+        while True:
+            with self._condition:
+                if ticket.admitted:
+                    return True
+                if ticket.released or (cancel is not None and cancel.cancelled):
+                    return False
+                position = self._waiting.index(ticket) + 1
+                if position == last_position:
+                    self._condition.wait(_CANCEL_POLL_SECONDS)
+                    continue
+            # Report outside the lock; the callback may be slow UI code
+            last_position = position
+            if on_position is not None:
+                on_position(position)
+
+    def _release(self, ticket):
+        with self._condition:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket.admitted:
+                self.active -= 1
+            else:
+                self._waiting.remove(ticket)
+            self._admit()
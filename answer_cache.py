@@ -0,0 +1,132 @@
+"""Process-wide cache of per-page pipeline outputs."""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from metrics import metrics
+
+
+def normalize_question(question):
+    """Trim the question and collapse runs of whitespace.
+
+    Searches run the model on this same text, so questions differing only
+    in spacing share cache entries and get identical answers.
+    """
+    return " ".join(question.split())
+
+
+def cache_key(doc_id, page_index, question, params, model_id):
+    """Key of one page's pipeline output for a question and model configuration."""
+    payload = json.dumps(
+        [doc_id, page_index, normalize_question(question), sorted(params.items()), model_id]
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=20).hexdigest()
+
+
+class AnswerCache:
+    """Thread-safe LRU of pipeline outputs bounded by their serialized size.
+
+    Entries are accounted by the length of their JSON encoding. When
+    ``spill_path`` is set, entries evicted from memory are written to a
+    SQLite file there, which holds at most ``spill_max_bytes`` (oldest
+    spills are dropped first); a disk hit moves the entry back to memory.
+    """
+
+    def __init__(self, max_bytes=64 << 20, spill_path=None, spill_max_bytes=1 << 30):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.spill_max_bytes = spill_max_bytes
+        self.spill_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._spill = None
+        if spill_path:
+            directory = os.path.dirname(spill_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._spill = sqlite3.connect(spill_path, timeout=30, check_same_thread=False)
+            with self._spill:
+                self._spill.execute("PRAGMA journal_mode=WAL")
+                self._spill.execute(
+                    "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+                )
+            self.spill_bytes = self._spill.execute(
+                "SELECT COALESCE(SUM(LENGTH(key) + LENGTH(value)), 0) FROM answers"
+            ).fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                metrics.increment("answer_cache_hits")
+                return json.loads(entry)
+            row = None
+            if self._spill is not None:
+                row = self._spill.execute(
+                    "SELECT value FROM answers WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    # The entry moves back to memory; it is spilled again if evicted
+                    with self._spill:
+                        self._spill.execute("DELETE FROM answers WHERE key = ?", (key,))
+                    self.spill_bytes -= len(key) + len(row[0])
+        if row is None:
+            metrics.increment("answer_cache_misses")
+            return None
+        metrics.increment("answer_cache_hits")
+        metrics.increment("answer_cache_disk_hits")
+        self._store(key, row[0])
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        # Pipeline scores are numpy scalars
+        self._store(key, json.dumps(value, default=lambda o: o.item()))
+
+    def _store(self, key, encoded):
+        size = len(key) + len(encoded)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(key) + len(previous)
+            self._entries[key] = encoded
+            self.bytes += size
+            evicted = []
+            while self.bytes > self.max_bytes:
+                old_key, old_encoded = self._entries.popitem(last=False)
+                self.bytes -= len(old_key) + len(old_encoded)
+                evicted.append((old_key, old_encoded))
+            if self._spill is not None and evicted:
+                self._spill_entries(evicted)
+        metrics.set("answer_cache_bytes", self.bytes)
+
+    def _spill_entries(self, entries):
+        # Called with the lock held. Entries in memory are never also on
+        # disk, so every spilled row is new
+        with self._spill:
+            self._spill.executemany(
+                "INSERT OR REPLACE INTO answers (key, value) VALUES (?, ?)", entries
+            )
+            self.spill_bytes += sum(len(key) + len(encoded) for key, encoded in entries)
+            while self.spill_bytes > self.spill_max_bytes:
+                oldest = self._spill.execute(
+                    "SELECT rowid, LENGTH(key) + LENGTH(value) FROM answers"
+                    " ORDER BY rowid LIMIT 256"
+                ).fetchall()
+                if not oldest:
+                    self.spill_bytes = 0
+                    break
+                self._spill.executemany(
+                    "DELETE FROM answers WHERE rowid = ?", [(rowid,) for rowid, _ in oldest]
+                )
+                self.spill_bytes -= sum(size for _, size in oldest)
+        metrics.set("answer_cache_spill_bytes", self.spill_bytes)
@@ -0,0 +1,132 @@
+"""HTTP API over the document QA engine.
+
+    uvicorn api:app --port 8000
+
+    POST /documents?name=invoice.pdf  (raw PDF body)             -> {"doc_id", "name", "pages"}
+    GET  /documents/{doc_id}                                       -> {"doc_id", "name", "pages"}
+    POST /documents/{doc_id}/ask  {"question", "mode", "limit"}    -> NDJSON stream
+
+The ask endpoint streams one JSON line per page as it is searched (best
+matching pages first; ``limit`` caps thorough searches to that many), then a
+final ``{"done": true, "answers": [...]}`` line with all answers sorted by
+score, and ``"degraded": true`` when load forced a Thorough search into
+Quick mode. When too many searches are already queued the endpoint answers
+503. ``create_app(engine)`` serves an existing engine, sharing its model
+and caches; with ``fastapi.testclient.TestClient(create_app(engine))`` the
+API can be exercised in-process. Setting ``DOCQA_API_PORT`` makes the
+Streamlit app serve it from its own process via ``serve_in_background``.
+Requires the optional ``fastapi`` and ``uvicorn`` packages.
+"""
+import json
+import threading
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
+
+from admission import Overloaded
+from engine import QUICK, THOROUGH, DocumentQAEngine
+from inference import CancelToken
+
+
+class AskRequest(BaseModel):
+    question: str
+    mode: Literal[QUICK, THOROUGH] = QUICK
+    limit: Optional[int] = None
+
+
+def _describe(document):
+    return {"doc_id": document.doc_id, "name": document.name, "pages": len(document.pages)}
+
+
+def create_app(engine=None):
+    """Build the ASGI app; without ``engine`` one is loaded from config at startup."""
+    state = {"engine": engine}
+
+    @asynccontextmanager
+    async def lifespan(app):
+        if state["engine"] is None:
+            state["engine"] = await run_in_threadpool(DocumentQAEngine.from_config)
+        yield
+
+    app = FastAPI(title="Document Q&A", lifespan=lifespan)
+
+    def get_document(doc_id):
+        document = state["engine"].document_cache.get(doc_id)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Unknown document; upload it again")
+        return document
+
+    @app.post("/documents")
+    async def upload_document(request: Request, name: str = None):
+        data = await request.body()
+        if not data:
+            raise HTTPException(status_code=400, detail="Request body must be a PDF")
+        try:
+            document = await run_in_threadpool(state["engine"].ingest, data, name)
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Error processing PDF: {e}")
+        return _describe(document)
+
+    @app.get("/documents/{doc_id}")
+    def describe_document(doc_id: str):
+        return _describe(get_document(doc_id))
+
+    @app.post("/documents/{doc_id}/ask")
+    def ask(doc_id: str, body: AskRequest):
+        document = get_document(doc_id)
+        engine = state["engine"]
+        try:
+            ticket = engine.search_admission.enter()
+        except Overloaded as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        cancel = CancelToken()
+
+        def finish():
+            # Stop the search's remaining work before freeing its slot
+            cancel.cancel()
+            ticket.release()
+
+        # A sync generator is iterated in the threadpool, one page at a time
+        def stream():
+            answers, degraded = [], False
+            for result in engine.search(
+                document, body.question, body.mode, cancel=cancel, limit=body.limit,
+                ticket=ticket
+            ):
+                line = {"page": result.page_index + 1, "answers": result.answers}
+                if result.error is not None:
+                    line["error"] = str(result.error)
+                answers.extend(result.answers)
+                degraded = degraded or result.degraded
+                yield json.dumps(line) + "\n"
+            answers.sort(key=lambda x: x['score'], reverse=True)
+            final = {"done": True, "answers": answers}
+            if degraded:
+                final["degraded"] = True
+            yield json.dumps(final) + "\n"
+
+        # Frees the slot even if the client disconnects before or while streaming
+        return StreamingResponse(
+            stream(),
+            media_type="application/x-ndjson",
+            background=BackgroundTask(finish)
+        )
+
+    return app
+
+
+def serve_in_background(engine, host="127.0.0.1", port=8000):
+    """Serve the API for ``engine`` from a daemon thread; return the uvicorn server."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(create_app(engine), host=host, port=port))
+    threading.Thread(target=server.run, name="docqa-api", daemon=True).start()
+    return server
+
+
+app = create_app()
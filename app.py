@@ -1,35 +1,130 @@
 import streamlit as st
-from transformers import pipeline
-from pdf2image import convert_from_path
-import os
-import tempfile
-from PIL import Image
-import time
+
+import config
+from engine import MODEL_NAME, QUICK, THOROUGH, DocumentQAEngine
+from inference import padding_ratio
+from inference_server import mean_queue_seconds
+from jobs import SearchJob, answer_key
+from metrics import metrics
+
+EXAMPLE_QUESTIONS = [
+    "What is the title of this document?",
+    "What is the date mentioned?",
+    "List the main points in this section.",
+    "What is written in the first paragraph?",
+]
+
+SEARCH_MODES = {
+    "Quick (Best match)": QUICK,
+    "Thorough (All pages)": THOROUGH,
+}
 
 # Initialize session state variables if they don't exist
-if 'processed_pages' not in st.session_state:
-    st.session_state.processed_pages = None
-if 'current_file_name' not in st.session_state:
-    st.session_state.current_file_name = None
+if 'document' not in st.session_state:
+    st.session_state.document = None
+if 'current_upload_id' not in st.session_state:
+    st.session_state.current_upload_id = None
+if 'search_results' not in st.session_state:
+    # Searches keyed by (document hash, question, mode), oldest first
+    st.session_state.search_results = {}
 
 # Configure page
 st.set_page_config(page_title="Document Q&A", layout="wide")
 
-# Initialize the document-question-answering pipeline
+# The engine holds the model and the document and OCR caches shared by
+# every session in this process
 @st.cache_resource
-def load_pipeline():
-    return pipeline(
-        "document-question-answering",
-        model="impira/layoutlm-document-qa",
-        device=-1
-    )
+def get_engine():
+    return DocumentQAEngine.from_config()
+
+# Optionally serve the HTTP API from this process, sharing the engine
+@st.cache_resource
+def start_api():
+    from api import serve_in_background
+    return serve_in_background(get_engine(), host=config.API_HOST, port=config.API_PORT)
 
 try:
-    query_pipeline = load_pipeline()
+    engine = get_engine()
 except Exception as e:
     st.error(f"Error loading model: {str(e)}")
     st.stop()
 
+if config.API_PORT:
+    start_api()
+
+def search_key(document, question, mode, limit):
+    return (document.doc_id, question.strip(), mode, limit)
+
+def render_search_results(job):
+    answers, page_errors, searched, planned = job.snapshot()
+
+    if not job.done and job.queue_position is not None:
+        st.info(f"⏳ Server busy: your search is number {job.queue_position} in the queue...")
+        if st.button("✖ Cancel search", disabled=job.cancelled):
+            job.cancel()
+    elif not job.done:
+        st.progress(
+            searched / planned if planned else 0.0,
+            text=f"Searched {searched}/{planned or '?'} pages (most relevant first)..."
+        )
+        if st.button("✖ Cancel search", disabled=job.cancelled):
+            job.cancel()
+    elif job.cancelled:
+        st.info("Search cancelled.")
+    elif job.error is not None:
+        st.error(f"Search failed: {str(job.error)}")
+    if job.degraded:
+        st.info("The server is busy, so this search ran in Quick mode. Search again for all pages.")
+
+    for i, error in page_errors:
+        st.warning(f"Error processing page {i+1}: {str(error)}")
+
+    # Display results, best first, as pages complete
+    if answers:
+        st.markdown("### 📝 Results")
+        
+        seen = {}
+        for idx, answer in enumerate(answers):
+            with st.expander(
+                f"Answer {idx+1} - Page {answer['page']} (Confidence: {answer['score']:.2%})",
+                expanded=True
+            ):
+                st.write(answer['answer'])
+                
+                # Feedback is kept on the stored search, so reruns keep it
+                key = answer_key(answer)
+                # Overlapping chunks can return the same answer twice
+                seen[key] = seen.get(key, 0) + 1
+                widget_key = f"{key}_{seen[key]}"
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.button(f"👍 Helpful", key=f"helpful_{widget_key}"):
+                        job.record_feedback(answer, True)
+                        metrics.increment("feedback_helpful")
+                with col2:
+                    if st.button(f"👎 Not Helpful", key=f"not_helpful_{widget_key}"):
+                        job.record_feedback(answer, False)
+                        metrics.increment("feedback_not_helpful")
+                if job.feedback.get(key) is True:
+                    st.success("Thank you for your feedback!")
+                elif job.feedback.get(key) is False:
+                    st.info("Thank you for your feedback! Try rephrasing the question.")
+    elif job.done:
+        st.warning("No answers found. Try these tips:")
+        st.markdown("""
+        - Try asking about specific text you can see in the document
+        - Break down complex questions into simpler ones
+        - Check if the text in your PDF is actual text (not an image)
+        - Use the exact words that appear in the document
+        """)
+
+    # Hand back to a full run once finished, which stops the polling
+    if job.done and st.session_state.get("polling_job") is job:
+        st.session_state.polling_job = None
+        st.rerun()
+    if not job.done:
+        st.session_state.polling_job = job
+
 st.title("📄 Document Question-Answering System")
 
 # Create two columns for layout
@@ -44,38 +139,34 @@ with col1:
 
     if uploaded_file:
         # Check if we need to process a new file
-        if (st.session_state.current_file_name != uploaded_file.name or 
-            st.session_state.processed_pages is None):
+        if (st.session_state.current_upload_id != uploaded_file.file_id or 
+            st.session_state.document is None):
             
             with st.spinner("Processing PDF..."):
-                # Create a temporary file
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-                    temp_file_path = temp_file.name
-                    temp_file.write(uploaded_file.getvalue())
-
                 try:
-                    # Convert PDF to images
-                    pages = convert_from_path(
-                        temp_file_path,
-                        dpi=300
+                    # Identical uploads from any session map to the same document.
+                    # getvalue() returns the upload's bytes without copying them
+                    ingest_progress = st.progress(0.0, text="Processing pages...")
+                    document = engine.ingest(
+                        memoryview(uploaded_file.getvalue()),
+                        name=uploaded_file.name,
+                        progress=lambda stage, done, total, message: ingest_progress.progress(
+                            done / total, text=message
+                        )
                     )
-                    st.session_state.processed_pages = pages
-                    st.session_state.current_file_name = uploaded_file.name
+                    ingest_progress.empty()
+                    st.session_state.document = document
+                    st.session_state.current_upload_id = uploaded_file.file_id
                     
-                    st.success(f"✅ Document loaded successfully! ({len(pages)} pages)")
+                    st.success(f"✅ Document loaded successfully! ({len(document.pages)} pages)")
                 
                 except Exception as e:
                     st.error(f"❌ Error processing PDF: {str(e)}")
-                    st.session_state.processed_pages = None
-                
-                finally:
-                    # Clean up temporary file
-                    if os.path.exists(temp_file_path):
-                        os.remove(temp_file_path)
+                    st.session_state.document = None
 
         # Display document preview
-        if st.session_state.processed_pages:
-            pages = st.session_state.processed_pages
+        if st.session_state.document:
+            pages = st.session_state.document.pages
             
             if len(pages) == 1:
                 st.image(
@@ -98,18 +189,24 @@ with col1:
                 )
                 current_page_idx = preview_page - 1
 
+            # Pages are rendered at model resolution; re-render on demand to zoom
+            if st.checkbox("🔎 High-resolution zoom", help=f"Render this page at {config.ZOOM_DPI} DPI"):
+                with st.spinner("Rendering page..."):
+                    zoomed_page = pages.render_high_resolution(current_page_idx, dpi=config.ZOOM_DPI)
+                st.image(
+                    zoomed_page,
+                    caption=f"Page {current_page_idx + 1} at {config.ZOOM_DPI} DPI"
+                )
+
 with col2:
-    if st.session_state.processed_pages:
+    if st.session_state.document:
         st.markdown("### Ask Questions")
         
         # Example questions based on current page
-        st.markdown("""
-        **Example questions you can ask:**
-        - "What is the title of this document?"
-        - "What is the date mentioned?"
-        - "List the main points in this section."
-        - "What is written in the first paragraph?"
-        """)
+        st.markdown(
+            "**Example questions you can ask:**\n"
+            + "\n".join(f'- "{example}"' for example in EXAMPLE_QUESTIONS)
+        )
         
         question = st.text_input(
             "Enter your question:",
@@ -122,110 +219,107 @@ with col2:
             ["Quick (Best match)", "Thorough (All pages)"],
             help="Quick mode searches until it finds a good answer. Thorough mode checks all pages."
         )
+        
+        page_limit = st.number_input(
+            "Thorough mode: pages to search (0 = all)",
+            min_value=0,
+            value=config.THOROUGH_PAGE_LIMIT,
+            help="Only search the pages that best match the question's words"
+        ) or None
 
         if st.button("🔍 Search for Answer", use_container_width=True):
             if question:
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                all_answers = []
-                pages = st.session_state.processed_pages
-                
-                for i, page in enumerate(pages):
-                    progress = (i + 1) / len(pages)
-                    progress_bar.progress(progress)
-                    status_text.text(f"Processing page {i+1}/{len(pages)}...")
-                    
-                    try:
-                        # Preprocess the image
-                        page_rgb = page.convert('RGB')
-                        
-                        # Adjust image size if needed
-                        max_size = 1000
-                        if max(page_rgb.size) > max_size:
-                            ratio = max_size / max(page_rgb.size)
-                            new_size = tuple(int(dim * ratio) for dim in page_rgb.size)
-                            page_rgb = page_rgb.resize(new_size, Image.LANCZOS)
-                        
-                        # Process with more lenient confidence threshold
-                        result = query_pipeline(
-                            question=question,
-                            image=page_rgb,
-                            top_k=3,
-                            max_length=512,
-                            max_answer_length=200
-                        )
-                        
-                        if isinstance(result, dict):
-                            result = [result]
-                        
-                        for res in result:
-                            if res and isinstance(res, dict):
-                                answer = res.get('answer', '').strip()
-                                score = res.get('score', 0)
-                                
-                                if score > 0.01 and len(answer) > 0:
-                                    all_answers.append({
-                                        'page': i+1,
-                                        'answer': answer,
-                                        'score': score
-                                    })
-                        
-                        if search_mode == "Quick (Best match)" and all_answers and all_answers[-1]['score'] > 0.05:
-                            break
-                    
-                    except Exception as e:
-                        st.warning(f"Error processing page {i+1}: {str(e)}")
-                        continue
-                
-                progress_bar.empty()
-                status_text.empty()
-                
-                # Display results
-                if all_answers:
-                    st.markdown("### 📝 Results")
-                    all_answers.sort(key=lambda x: x['score'], reverse=True)
-                    
-                    for idx, answer in enumerate(all_answers):
-                        with st.expander(
-                            f"Answer {idx+1} - Page {answer['page']} (Confidence: {answer['score']:.2%})",
-                            expanded=True
-                        ):
-                            st.write(answer['answer'])
-                            
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                if st.button(f"👍 Helpful", key=f"helpful_{idx}"):
-                                    st.success("Thank you for your feedback!")
-                            with col2:
-                                if st.button(f"👎 Not Helpful", key=f"not_helpful_{idx}"):
-                                    st.info("Thank you for your feedback! Try rephrasing the question.")
-                else:
-                    st.warning("No answers found. Try these tips:")
-                    st.markdown("""
-                    - Try asking about specific text you can see in the document
-                    - Break down complex questions into simpler ones
-                    - Check if the text in your PDF is actual text (not an image)
-                    - Use the exact words that appear in the document
-                    """)
+                key = search_key(
+                    st.session_state.document, question, SEARCH_MODES[search_mode], page_limit
+                )
+                stored = st.session_state.search_results.get(key)
+                # Completed searches are shown again instead of recomputed
+                if stored is None or (stored.done and not stored.reusable):
+                    # A new search stops any other search still running
+                    # (finished ones stay reusable)
+                    for other in st.session_state.search_results.values():
+                        if not other.done:
+                            other.cancel()
+                    # The search runs in the background; results stream in below
+                    st.session_state.search_results[key] = SearchJob(
+                        engine,
+                        st.session_state.document,
+                        question,
+                        SEARCH_MODES[search_mode],
+                        limit=page_limit
+                    ).start()
+                    while len(st.session_state.search_results) > config.STORED_SEARCHES:
+                        oldest = next(iter(st.session_state.search_results))
+                        st.session_state.search_results.pop(oldest).cancel()
             else:
                 st.warning("Please enter a question first.")
+
+        # Show the stored search for the current document, question and mode
+        job = None
+        if question:
+            job = st.session_state.search_results.get(
+                search_key(
+                    st.session_state.document, question, SEARCH_MODES[search_mode], page_limit
+                )
+            )
+        if job is not None:
+            if job.done:
+                render_search_results(job)
+            else:
+                # Poll the running search, re-rendering only this fragment
+                st.fragment(render_search_results, run_every=config.SEARCH_POLL_SECONDS)(job)
     else:
         st.info("👈 Please upload a PDF document to begin asking questions.")
 
 # Debug information section
 with st.expander("🔧 Debug Information", expanded=False):
     st.markdown("### System Information")
-    st.write("Model:", "impira/layoutlm-document-qa")
-    if st.session_state.processed_pages:
-        st.write("Document pages:", len(st.session_state.processed_pages))
-        st.write("Current page dimensions:", st.session_state.processed_pages[0].size)
+    st.write("Model:", MODEL_NAME)
+    st.write("Backend:", engine.backend)
+    st.write("Warm-up time:", f"{metrics.get('warmup_seconds'):.2f}s")
+    st.write("Batch padding ratio:", f"{padding_ratio():.1%}")
+    if engine.inference_server is not None:
+        st.write("Mean inference queue wait:", f"{mean_queue_seconds() * 1000:.1f} ms")
+    st.write("Metrics:", metrics.snapshot())
+    if st.session_state.document:
+        st.write("Document hash:", st.session_state.document.doc_id)
+        st.write("Document pages:", len(st.session_state.document.pages))
+        st.write(
+            "Indexed words:",
+            sum(len(boxes) for boxes in st.session_state.document.word_boxes)
+        )
+        st.write("Current page dimensions:", st.session_state.document.pages[0].size)
+        st.write("Documents cached in this process:", len(engine.document_cache))
+        if engine.ocr_store is not None:
+            st.write("Pages in OCR store:", len(engine.ocr_store))
+        if engine.answer_cache is not None:
+            st.write(
+                "Answer cache:",
+                f"{len(engine.answer_cache)} pages, {engine.answer_cache.bytes / 2**20:.1f} MiB"
+            )
         
         test_question = st.text_input("Enter a test question:", value="What is written here?")
         if st.button("Run Test Query"):
             try:
-                test_page = st.session_state.processed_pages[0].convert('RGB')
-                result = query_pipeline(question=test_question, image=test_page)
+                test_page = st.session_state.document.pages[0].convert('RGB')
+                result = engine.pipe(
+                    question=test_question,
+                    image=test_page,
+                    word_boxes=st.session_state.document.word_boxes[0] or None
+                )
                 st.write("Raw result:", result)
             except Exception as e:
-                st.error(f"Test error: {str(e)}")
\ No newline at end of file
+                st.error(f"Test error: {str(e)}")
+
+        st.markdown("### int8 vs fp32")
+        if st.button("Compare quantized model"):
+            with st.spinner(
+                f"Running example questions on both models "
+                f"(top {config.COMPARE_PAGE_LIMIT} pages each)..."
+            ):
+                try:
+                    st.table(
+                        engine.compare_quantized(st.session_state.document, EXAMPLE_QUESTIONS)
+                    )
+                except Exception as e:
+                    st.error(f"Comparison failed: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""Answer a fixed set of questions over many PDFs from the command line.
+
+    python cli.py invoices/ questions.txt --workers 8 --output results.jsonl
+    python cli.py "scans/2024-*.pdf" questions.txt --mode thorough
+
+Documents are spread over a process pool with one engine (and model) per
+worker. One JSON line per document is written as soon as it finishes, with
+its answers and timings.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import config
+from engine import QUICK, THOROUGH
+
+_engine = None
+
+
+def find_pdfs(pattern):
+    """Return the PDFs in directory ``pattern`` (recursively), or matching the glob."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "**", "*.pdf")
+    return sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+
+
+def read_questions(path):
+    """Read one question per line, skipping blank lines and ``#`` comments."""
+    with open(path, encoding="utf8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def _init_worker(torch_threads):
+    global _engine
+    from engine import DocumentQAEngine
+
+    # Parallelism comes from the document pool; keep each worker's own
+    # render, OCR and model (torch or ONNX Runtime) threads from
+    # oversubscribing the cores
+    config.TORCH_THREADS = torch_threads
+    config.RENDER_WORKERS = 1
+    config.OCR_WORKERS = 1
+    config.DOCUMENT_CACHE_SIZE = 1
+    # A worker searches one document at a time, so there is nothing to gather
+    config.BATCH_WAIT_MS = 0
+    _engine = DocumentQAEngine.from_config()
+
+
+def process_document(path, questions, mode, limit=None):
+    """Ingest ``path`` and answer every question; return a JSON-serializable record."""
+    start = time.perf_counter()
+    record = {"document": path}
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        document = _engine.ingest(data, name=os.path.basename(path))
+        record["doc_id"] = document.doc_id
+        record["pages"] = len(document.pages)
+        record["ingest_seconds"] = round(time.perf_counter() - start, 3)
+
+        record["results"] = []
+        for question in questions:
+            question_start = time.perf_counter()
+            answers = _engine.ask(document, question, mode, limit=limit)
+            record["results"].append({
+                "question": question,
+                "answers": answers,
+                "seconds": round(time.perf_counter() - question_start, 3),
+            })
+    except Exception as e:
+        record["error"] = str(e)
+    record["total_seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("documents", help="directory of PDFs, or a glob pattern")
+    parser.add_argument("questions", help="text file with one question per line")
+    parser.add_argument("--mode", choices=[QUICK, THOROUGH], default=THOROUGH)
+    parser.add_argument("--top-pages", type=int, default=None,
+                        help="in thorough mode, only search this many best-matching pages")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 4),
+                        help="worker processes, each loading its own model")
+    parser.add_argument("--output", "-o", help="JSONL file to write (default: stdout)")
+    args = parser.parse_args(argv)
+
+    paths = find_pdfs(args.documents)
+    questions = read_questions(args.questions)
+    if not paths:
+        parser.error(f"no PDFs found for {args.documents!r}")
+    if not questions:
+        parser.error(f"no questions in {args.questions!r}")
+
+    torch_threads = max(1, (os.cpu_count() or 1) // args.workers)
+    output = open(args.output, "w", encoding="utf8") if args.output else sys.stdout
+    failures = 0
+    try:
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(torch_threads,)
+        ) as executor:
+            futures = [
+                executor.submit(process_document, path, questions, args.mode, args.top_pages)
+                for path in paths
+            ]
+            for future in as_completed(futures):
+                record = future.result()
+                failures += "error" in record
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"Processed {len(paths)} documents ({failures} failed)", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Runtime settings, overridable through ``DOCQA_*`` environment variables."""
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+# Number of rendered page images kept in memory per document
+PAGE_CACHE_SIZE = _env_int("DOCQA_PAGE_CACHE_SIZE", 32)
+
+# Number of consecutive pages rasterized by a single poppler invocation
+RENDER_CHUNK_SIZE = _env_int("DOCQA_RENDER_CHUNK_SIZE", 4)
+
+# Concurrent poppler processes used to rasterize a page range
+RENDER_WORKERS = _env_int("DOCQA_RENDER_WORKERS", os.cpu_count() or 1)
+
+# Longest side, in pixels, of page images rendered for the model
+MODEL_IMAGE_SIZE = _env_int("DOCQA_MODEL_IMAGE_SIZE", 1000)
+
+# Resolution of the on-demand high-resolution zoom render
+ZOOM_DPI = _env_int("DOCQA_ZOOM_DPI", 300)
+
+# Uploads larger than this many bytes are spooled to a temporary file instead
+# of being piped to poppler from memory
+SPOOL_THRESHOLD_BYTES = _env_int("DOCQA_SPOOL_THRESHOLD_BYTES", 64 << 20)
+
+# Ingested documents shared across sessions, keyed by content hash
+DOCUMENT_CACHE_SIZE = _env_int("DOCQA_DOCUMENT_CACHE_SIZE", 8)
+
+# Pages whose text layer has fewer words than this are OCR'd instead
+TEXT_LAYER_MIN_WORDS = _env_int("DOCQA_TEXT_LAYER_MIN_WORDS", 3)
+
+# Worker processes running Tesseract at upload time
+OCR_WORKERS = _env_int("DOCQA_OCR_WORKERS", os.cpu_count() or 1)
+
+# Tesseract language and extra flags used when a page has to be OCR'd
+OCR_LANG = os.environ.get("DOCQA_OCR_LANG") or None
+TESSERACT_CONFIG = os.environ.get("DOCQA_TESSERACT_CONFIG", "")
+
+# SQLite file caching OCR results across sessions and restarts; empty disables it
+OCR_STORE_PATH = os.environ.get(
+    "DOCQA_OCR_STORE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "docqa", "ocr.sqlite3")
+)
+
+# Encoded page chunks sent through the model in one forward pass
+BATCH_SIZE = _env_int("DOCQA_BATCH_SIZE", 8)
+
+# Batches' worth of chunks sorted by length together before batching
+BUCKET_BATCHES = _env_int("DOCQA_BUCKET_BATCHES", 4)
+
+# How long, in milliseconds, the shared inference server gathers chunks from
+# concurrent searches into one batch; 0 runs each search's batches directly
+BATCH_WAIT_MS = _env_int("DOCQA_BATCH_WAIT_MS", 5)
+
+# Intra-op threads a forward pass uses, in torch or ONNX Runtime (0 keeps
+# the backend's default)
+TORCH_THREADS = _env_int("DOCQA_TORCH_THREADS", 0)
+
+# Searches running at once across all sessions; later ones queue for a slot
+MAX_ACTIVE_SEARCHES = _env_int("DOCQA_MAX_ACTIVE_SEARCHES", 4)
+
+# Searches allowed to queue; beyond this new searches are refused
+MAX_QUEUED_SEARCHES = _env_int("DOCQA_MAX_QUEUED_SEARCHES", 32)
+
+# Thorough searches arriving with this many searches queued run in Quick mode
+# instead (0 never degrades)
+DEGRADE_QUEUE_LENGTH = _env_int("DOCQA_DEGRADE_QUEUE_LENGTH", 4)
+
+# Uploads OCR'd at once across all sessions; later ones queue for a slot
+MAX_ACTIVE_OCR = _env_int("DOCQA_MAX_ACTIVE_OCR", 1)
+
+# Inference backend for the QA model: "torch" or "onnx" (needs onnxruntime)
+BACKEND = os.environ.get("DOCQA_BACKEND", "torch")
+
+# Directory holding the cached ONNX export of the model
+ONNX_CACHE_DIR = os.environ.get(
+    "DOCQA_ONNX_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "docqa", "onnx")
+)
+
+# Run the PyTorch backend with Linear layers dynamically quantized to int8
+# (not supported with the onnx backend)
+QUANTIZE = _env_bool("DOCQA_QUANTIZE", False)
+
+# Best ranked pages per question the int8 vs fp32 comparison runs on
+COMPARE_PAGE_LIMIT = _env_int("DOCQA_COMPARE_PAGE_LIMIT", 8)
+
+# When set, the Streamlit process also serves the HTTP API (api.py) on this
+# port, sharing its model and caches
+API_PORT = _env_int("DOCQA_API_PORT", 0)
+API_HOST = os.environ.get("DOCQA_API_HOST", "127.0.0.1")
+
+# How often the UI refreshes a search running in the background, in seconds
+SEARCH_POLL_SECONDS = float(os.environ.get("DOCQA_SEARCH_POLL_SECONDS", 0.5))
+
+# Completed searches kept per session for re-display without recomputation
+STORED_SEARCHES = _env_int("DOCQA_STORED_SEARCHES", 20)
+
+# Page ranking before the model runs: "bm25", "semantic" or "hybrid" (both)
+RANKING = os.environ.get("DOCQA_RANKING", "hybrid")
+
+# Latent dimensions of the per-document semantic page index
+SEMANTIC_DIMENSIONS = _env_int("DOCQA_SEMANTIC_DIMENSIONS", 128)
+
+# Default number of best-ranked pages Thorough mode searches (0 = all pages)
+THOROUGH_PAGE_LIMIT = _env_int("DOCQA_THOROUGH_PAGE_LIMIT", 0)
+
+# Memory budget of the per-page answer cache, in bytes of serialized output
+ANSWER_CACHE_BYTES = _env_int("DOCQA_ANSWER_CACHE_BYTES", 64 << 20)
+
+# SQLite file that answers evicted from memory spill to; empty keeps them in memory only
+ANSWER_CACHE_PATH = os.environ.get("DOCQA_ANSWER_CACHE_PATH", "")
+
+# Size cap of that SQLite file's answers, in bytes; the oldest spills go first
+ANSWER_CACHE_SPILL_BYTES = _env_int("DOCQA_ANSWER_CACHE_SPILL_BYTES", 1 << 30)
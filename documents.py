@@ -0,0 +1,87 @@
+"""Content-addressed documents and the process-wide cache that holds them."""
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+_HASH_CHUNK_SIZE = 1 << 20
+
+
+def content_hash(data):
+    """Return a hex BLAKE2b digest of ``data``, hashed in 1 MiB slices.
+
+    ``data`` may be any bytes-like object; slicing a ``memoryview`` does not
+    copy, so large uploads are hashed without materializing a second buffer.
+    """
+    view = memoryview(data)
+    digest = hashlib.blake2b(digest_size=20)
+    for offset in range(0, view.nbytes, _HASH_CHUNK_SIZE):
+        digest.update(view[offset:offset + _HASH_CHUNK_SIZE])
+    return digest.hexdigest()
+
+
+@dataclass
+class Document:
+    """An ingested PDF, identified by the hash of its bytes.
+
+    ``word_boxes`` is the page index built at ingestion: for every page, the
+    words and 0-1000 normalized boxes read from the PDF text layer or, for
+    pages without one, computed once by OCR. ``lexical_index`` and
+    ``semantic_index`` rank pages against a question (``retrieval``).
+    """
+
+    doc_id: str
+    name: str
+    pages: object
+    word_boxes: list
+    lexical_index: object = None
+    semantic_index: object = None
+
+
+class DocumentCache:
+    """Thread-safe LRU cache of ingested documents keyed by content hash.
+
+    ``get_or_create`` serializes ingestion per key, so concurrent uploads of
+    the same file from different sessions ingest it only once.
+    """
+
+    def __init__(self, max_documents=8):
+        self.max_documents = max(1, max_documents)
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._documents)
+
+    def get(self, doc_id):
+        with self._lock:
+            document = self._documents.get(doc_id)
+            if document is not None:
+                self._documents.move_to_end(doc_id)
+            return document
+
+    def put(self, document):
+        with self._lock:
+            self._documents[document.doc_id] = document
+            self._documents.move_to_end(document.doc_id)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+
+    def get_or_create(self, doc_id, factory):
+        """Return the cached document for ``doc_id``, calling ``factory`` on a miss."""
+        document = self.get(doc_id)
+        if document is not None:
+            return document
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(doc_id, threading.Lock())
+        with key_lock:
+            document = self.get(doc_id)
+            if document is None:
+                document = factory()
+                self.put(document)
+        with self._lock:
+            self._key_locks.pop(doc_id, None)
+        return document
@@ -0,0 +1,435 @@
+"""Headless document question answering, independent of the Streamlit UI.
+
+``DocumentQAEngine`` owns the model, the document and answer caches, the
+OCR store and the admission controllers that bound concurrent searches and
+OCR jobs. ``ingest`` turns PDF bytes into a ``Document`` and ``ask``
+answers a question over it, so the whole flow can run in workers,
+benchmarks or other services without a browser.
+"""
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from transformers import pipeline
+
+import config
+from admission import AdmissionController
+from answer_cache import AnswerCache, cache_key, normalize_question
+from documents import Document, DocumentCache, content_hash
+from inference import answer_pages, warm_up
+from inference_server import InferenceServer
+from metrics import metrics
+from ocr import ocr_pages
+from ocr_store import OcrStore
+from pdf_pages import LazyPages, PdfSource
+from quantization import compare_models, quantize_model
+from retrieval import Bm25Index, SemanticIndex, fuse_rankings
+from text_layer import extract_word_boxes
+
+MODEL_NAME = "impira/layoutlm-document-qa"
+
+QUICK = "quick"
+THOROUGH = "thorough"
+
+# Arguments of every pipeline call made by the search loop
+QUERY_KWARGS = {"top_k": 3, "max_length": 512, "max_answer_length": 200}
+
+# Answers scoring at or below this are discarded
+MIN_SCORE = 0.01
+
+# Quick mode stops at the first page whose last kept answer beats this
+QUICK_STOP_SCORE = 0.05
+
+
+def load_pipeline(model_name=MODEL_NAME):
+    """Build the CPU document-question-answering pipeline."""
+    return pipeline(
+        "document-question-answering",
+        model=model_name,
+        device=-1
+    )
+
+
+@dataclass
+class PageResult:
+    """Answers kept for one searched page, or the error raised while searching it.
+
+    ``planned_pages`` is how many pages the search intends to visit;
+    ``degraded`` is set when a Thorough search ran in Quick mode because of
+    load.
+    """
+
+    page_index: int
+    answers: list
+    error: Exception = None
+    planned_pages: int = 0
+    degraded: bool = False
+
+
+class DocumentQAEngine:
+    """Ingests PDFs and answers questions about them.
+
+    ``model`` is what the batched search path runs (the pipeline's own
+    model, its int8 copy or an ONNX Runtime session). When
+    ``inference_server`` is set, searches submit their chunks to it instead,
+    sharing batches with concurrent searches. ``from_config`` builds an
+    engine from the ``DOCQA_*`` settings.
+    """
+
+    def __init__(self, pipe, model=None, backend="torch (fp32)", document_cache=None,
+                 ocr_store=None, answer_cache=None, inference_server=None,
+                 search_admission=None, ocr_admission=None):
+        self.pipe = pipe
+        self.model = model if model is not None else pipe.model
+        self.backend = backend
+        self.document_cache = document_cache or DocumentCache(config.DOCUMENT_CACHE_SIZE)
+        self.ocr_store = ocr_store
+        self.answer_cache = answer_cache
+        self.inference_server = inference_server
+        self.search_admission = search_admission or AdmissionController(
+            "search", config.MAX_ACTIVE_SEARCHES, config.MAX_QUEUED_SEARCHES
+        )
+        self.ocr_admission = ocr_admission or AdmissionController("ocr", config.MAX_ACTIVE_OCR)
+        self._quantized_model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model_id(self):
+        """Identifies the model configuration answers were computed with."""
+        return f"{self.pipe.model.name_or_path}:{self.backend}"
+
+    @classmethod
+    def from_config(cls):
+        """Load the pipeline and serving model per ``config`` and warm them up."""
+        if config.TORCH_THREADS:
+            import torch
+            torch.set_num_threads(config.TORCH_THREADS)
+        pipe = load_pipeline()
+        engine = cls(
+            pipe,
+            document_cache=DocumentCache(config.DOCUMENT_CACHE_SIZE),
+            ocr_store=OcrStore(config.OCR_STORE_PATH) if config.OCR_STORE_PATH else None,
+            answer_cache=AnswerCache(
+                config.ANSWER_CACHE_BYTES,
+                config.ANSWER_CACHE_PATH,
+                spill_max_bytes=config.ANSWER_CACHE_SPILL_BYTES
+            )
+        )
+        if config.BACKEND == "onnx" and config.QUANTIZE:
+            raise ValueError(
+                "DOCQA_QUANTIZE only applies to the torch backend; "
+                "unset it or use DOCQA_BACKEND=torch"
+            )
+        if config.BACKEND == "onnx":
+            from onnx_backend import load_onnx_model
+            engine.model = load_onnx_model(
+                pipe, config.ONNX_CACHE_DIR, threads=config.TORCH_THREADS
+            )
+            engine.backend = "onnx"
+        elif config.QUANTIZE:
+            engine.model = engine.quantized_model()
+            engine.backend = "torch (int8)"
+        warm_up(pipe, model=engine.model, batch_sizes=(1, config.BATCH_SIZE))
+        if config.BATCH_WAIT_MS > 0:
+            engine.inference_server = InferenceServer(
+                pipe,
+                model=engine.model,
+                batch_size=config.BATCH_SIZE,
+                bucket_batches=config.BUCKET_BATCHES,
+                max_wait=config.BATCH_WAIT_MS / 1000
+            )
+        return engine
+
+    def quantized_model(self):
+        """Return the dynamic int8 copy of the pipeline model, building it once."""
+        with self._lock:
+            if self._quantized_model is None:
+                self._quantized_model = quantize_model(self.pipe.model)
+            return self._quantized_model
+
+    def ingest(self, data, name=None, progress=None):
+        """Return the ``Document`` for the PDF bytes ``data``.
+
+        Documents are cached by content hash, so identical bytes are only
+        processed once per process. ``progress(stage, done, total, message)``
+        is called as pages are rendered (``"render"``) and OCR'd (``"ocr"``),
+        including while the upload waits for an OCR slot.
+        """
+        doc_id = content_hash(data)
+        return self.document_cache.get_or_create(
+            doc_id,
+            lambda: self._ingest(doc_id, data, name or doc_id, progress)
+        )
+
+    def _ingest(self, doc_id, data, name, progress):
+        # Hand the buffer to poppler without copying it; the page count is
+        # read now and pages are rasterized on demand
+        source = PdfSource(data, spool_threshold=config.SPOOL_THRESHOLD_BYTES)
+        pages = LazyPages(
+            source,
+            size=config.MODEL_IMAGE_SIZE,
+            cache_size=config.PAGE_CACHE_SIZE,
+            chunk_size=config.RENDER_CHUNK_SIZE,
+            workers=config.RENDER_WORKERS
+        )
+
+        # Only the first preview chunk is rendered now: the search reads
+        # words, not images, and pages needing OCR are rendered below
+        def report_render(done, total):
+            if progress is not None:
+                progress("render", done, total, f"Rendered {done}/{total} pages")
+
+        pages.prefetch(0, config.RENDER_CHUNK_SIZE, progress=report_render)
+
+        # Born-digital pages carry their words in the text layer
+        word_boxes = extract_word_boxes(source, len(pages), min_words=config.TEXT_LAYER_MIN_WORDS)
+
+        # OCR the remaining pages once, so questions never re-run Tesseract
+        ocr_indices = [i for i, boxes in enumerate(word_boxes) if boxes is None]
+        if ocr_indices:
+            self._ocr(pages, ocr_indices, word_boxes, progress)
+
+        return Document(
+            doc_id=doc_id,
+            name=name,
+            pages=pages,
+            word_boxes=word_boxes,
+            lexical_index=Bm25Index.from_word_boxes(word_boxes),
+            semantic_index=SemanticIndex.from_word_boxes(
+                word_boxes,
+                dimensions=config.SEMANTIC_DIMENSIONS
+            )
+        )
+
+    def _ocr(self, pages, ocr_indices, word_boxes, progress):
+        # Concurrent uploads take turns, each OCR job using the whole pool
+        def report_queued(position):
+            if progress is not None:
+                progress(
+                    "ocr", 0, len(ocr_indices),
+                    f"Waiting to OCR {len(ocr_indices)} pages (position {position} in queue)"
+                )
+
+        ticket = self.ocr_admission.enter()
+        try:
+            ticket.wait(on_position=report_queued)
+            ocr_start = time.perf_counter()
+            results = ocr_pages(
+                pages.iter_pages(ocr_indices),
+                workers=config.OCR_WORKERS,
+                lang=config.OCR_LANG,
+                tesseract_config=config.TESSERACT_CONFIG,
+                store=self.ocr_store
+            )
+            for done, (i, boxes) in enumerate(zip(ocr_indices, results), start=1):
+                word_boxes[i] = boxes
+                if progress is not None:
+                    pages_per_second = done / (time.perf_counter() - ocr_start)
+                    progress(
+                        "ocr", done, len(ocr_indices),
+                        f"OCR {done}/{len(ocr_indices)} pages ({pages_per_second:.1f} pages/s)"
+                    )
+        finally:
+            ticket.release()
+
+    def plan(self, document, question, mode=QUICK, limit=None):
+        """Return the indices of the pages to search, in visiting order.
+
+        Pages are ranked against the question by BM25, by the semantic
+        index, or by both fused (``config.RANKING``), so quick mode reaches
+        the likeliest pages first; thorough mode searches every page, or
+        only the ``limit`` best ranked ones when given.
+        """
+        # Words were indexed at ingestion; blank pages cannot hold an answer
+        candidates = [i for i, word_boxes in enumerate(document.word_boxes) if word_boxes]
+        rankings = []
+        if config.RANKING in ("bm25", "hybrid") and document.lexical_index is not None:
+            rankings.append(document.lexical_index.rank(question, candidates))
+        if config.RANKING in ("semantic", "hybrid") and document.semantic_index is not None:
+            rankings.append(document.semantic_index.rank(question, candidates))
+        if rankings:
+            candidates = fuse_rankings(rankings) if len(rankings) > 1 else rankings[0]
+        if mode == THOROUGH and limit:
+            candidates = candidates[:limit]
+        return candidates
+
+    def search(self, document, question, mode=QUICK, cancel=None, limit=None, ticket=None):
+        """Yield a ``PageResult`` per searched page, in visiting order.
+
+        Pages are visited as ordered by ``plan``. Only answers scoring above
+        ``MIN_SCORE`` are kept. In quick mode the search stops after the
+        first page whose last kept answer scores above ``QUICK_STOP_SCORE``.
+        Setting the ``cancel`` token (``inference.CancelToken``) stops it
+        between pages and batches.
+
+        The search first waits for a slot from ``search_admission``, through
+        ``ticket`` when the caller already holds one (to show its place in
+        the queue); entering the queue raises ``admission.Overloaded`` when
+        it is full. A Thorough search that arrives behind
+        ``config.DEGRADE_QUEUE_LENGTH`` queued searches runs in Quick mode.
+        """
+        if ticket is None:
+            ticket = self.search_admission.enter()
+        try:
+            if not ticket.wait(cancel):
+                metrics.increment("searches_cancelled")
+                return
+            degraded = (
+                mode == THOROUGH
+                and config.DEGRADE_QUEUE_LENGTH > 0
+                and ticket.backlog >= config.DEGRADE_QUEUE_LENGTH
+            )
+            if degraded:
+                metrics.increment("searches_degraded")
+                mode = QUICK
+            yield from self._search(document, question, mode, cancel, limit, degraded)
+        finally:
+            ticket.release()
+
+    def _search(self, document, question, mode, cancel, limit, degraded):
+        planned = self.plan(document, question, mode, limit)
+        page_results = self._answer_pages(document, question, planned, mode, cancel)
+        searched = 0
+        for i, result, error in page_results:
+            searched += 1
+            if error is not None:
+                yield PageResult(i, [], error, len(planned), degraded)
+                continue
+
+            if isinstance(result, dict):
+                result = [result]
+
+            answers = []
+            for res in result:
+                if res and isinstance(res, dict):
+                    answer = res.get('answer', '').strip()
+                    score = res.get('score', 0)
+
+                    if score > MIN_SCORE and len(answer) > 0:
+                        answers.append({
+                            'page': i + 1,
+                            'answer': answer,
+                            'score': score
+                        })
+            yield PageResult(i, answers, planned_pages=len(planned), degraded=degraded)
+
+            if mode == QUICK and answers and answers[-1]['score'] > QUICK_STOP_SCORE:
+                break
+
+        metrics.increment("pages_searched", searched)
+        if cancel is not None and cancel.cancelled:
+            metrics.increment("searches_cancelled")
+            metrics.increment("pages_cancelled", len(planned) - searched)
+
+    def _answer_pages(self, document, question, planned, mode, cancel):
+        # Yields (page_index, pipeline output, error) in planned order,
+        # serving pages from the answer cache and batching the rest. Pages
+        # are looked up one at a time, as the search or the batching reaches
+        # them, and every computed window is cached even if the search stops
+        # partway. The model sees exactly the text the cache is keyed on
+        question = normalize_question(question)
+        remaining = iter(planned)
+        keys = {}
+        looked_up = deque()
+        misses = deque()
+
+        def look_up_next():
+            i = next(remaining, None)
+            if i is None:
+                return False
+            result = None
+            if self.answer_cache is not None:
+                keys[i] = cache_key(document.doc_id, i, question, QUERY_KWARGS, self.model_id)
+                result = self.answer_cache.get(keys[i])
+            looked_up.append((i, result))
+            if result is None:
+                misses.append(i)
+            return True
+
+        def uncached_pages():
+            while misses or look_up_next():
+                if misses:
+                    i = misses.popleft()
+                    yield i, document.word_boxes[i]
+
+        def cache_window(results):
+            if self.answer_cache is None:
+                return
+            for i, result, error in results:
+                if error is None:
+                    self.answer_cache.put(keys[i], result)
+
+        # Several pages (and, through the inference server, several
+        # searches) share each forward pass, bucketed by length. Quick mode
+        # answers the top ranked page first, then one batch at a time, so
+        # it stops without paying for a whole bucketing window
+        computed = answer_pages(
+            self.pipe,
+            question,
+            uncached_pages(),
+            batch_size=config.BATCH_SIZE,
+            bucket_batches=1 if mode == QUICK else config.BUCKET_BATCHES,
+            model=self.model,
+            cancel=cancel,
+            server=self.inference_server,
+            first_window=1 if mode == QUICK else None,
+            on_window=cache_window,
+            **QUERY_KWARGS
+        )
+        while True:
+            if cancel is not None and cancel.cancelled:
+                return
+            if not looked_up and not look_up_next():
+                return
+            i, cached = looked_up.popleft()
+            if cached is not None:
+                yield i, cached, None
+                continue
+            # Earlier misses were all yielded, so the batching's next result
+            # is this page's
+            page_result = next(computed, None)
+            if page_result is None:
+                return
+            yield page_result
+
+    def ask(self, document, question, mode=QUICK, cancel=None, limit=None):
+        """Return the answers to ``question`` over ``document``, best first."""
+        answers = [
+            answer
+            for result in self.search(document, question, mode, cancel=cancel, limit=limit)
+            for answer in result.answers
+        ]
+        answers.sort(key=lambda x: x['score'], reverse=True)
+        return answers
+
+    def compare_quantized(self, document, questions, page_limit=None):
+        """Compare fp32 and int8 latency and top-answer agreement on ``document``.
+
+        Each question is run on its ``page_limit`` best ranked pages
+        (default ``config.COMPARE_PAGE_LIMIT``). The comparison holds a
+        search slot from ``search_admission`` so it cannot crowd out live
+        searches; it runs its own batches, since it needs both models.
+        """
+        page_limit = page_limit or config.COMPARE_PAGE_LIMIT
+        planned = []
+        for question in questions:
+            for i in self.plan(document, question, THOROUGH, page_limit):
+                if i not in planned:
+                    planned.append(i)
+        pages = [(i, document.word_boxes[i]) for i in sorted(planned)]
+        ticket = self.search_admission.enter()
+        try:
+            ticket.wait()
+            return compare_models(
+                self.pipe,
+                self.pipe.model,
+                self.quantized_model(),
+                pages,
+                questions,
+                batch_size=config.BATCH_SIZE,
+                bucket_batches=config.BUCKET_BATCHES,
+                **QUERY_KWARGS
+            )
+        finally:
+            ticket.release()
@@ -0,0 +1,201 @@
+"""Batched forward passes for the document-question-answering pipeline.
+
+The pipeline's own ``__call__`` runs one sequence per forward pass. Here the
+pipeline's ``preprocess`` and ``postprocess`` steps are reused unchanged,
+but the encoded chunks of several pages are bucketed by length, padded into
+batches and sent through the model together.
+"""
+import threading
+import time
+
+import torch
+from torch.nn.utils.rnn import pad_sequence
+
+from metrics import metrics
+
+# Keys produced by the pipeline's preprocess step that are not model inputs
+_CHUNK_METADATA = ("p_mask", "word_ids", "words", "is_last")
+
+
+class CancelToken:
+    """Flag set by one thread to stop work running on another."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+def encode_page(pipe, question, word_boxes, preprocess_params):
+    """Encode one page into the list of chunks the pipeline would feed the model."""
+    inputs = {"question": question, "image": None, "word_boxes": word_boxes}
+    return list(pipe.preprocess(inputs, **preprocess_params))
+
+
+def run_batch(pipe, chunks, model=None):
+    """Run all ``chunks`` through the model in a single padded forward pass.
+
+    ``model`` replaces ``pipe.model`` for the forward pass when given, e.g.
+    an ``onnx_backend.OnnxQAModel``.
+
+    Returns one output dict per chunk in the shape the pipeline's
+    ``postprocess`` expects, with logits trimmed back to the chunk length.
+    """
+    lengths = [chunk["input_ids"].shape[1] for chunk in chunks]
+    batch_tokens = len(chunks) * max(lengths)
+    metrics.increment("inference_batches")
+    metrics.increment("inference_chunks", len(chunks))
+    metrics.increment("inference_tokens", batch_tokens)
+    metrics.increment("inference_padding_tokens", batch_tokens - sum(lengths))
+
+    input_names = [key for key in chunks[0] if key not in _CHUNK_METADATA]
+    batch = {}
+    for key in input_names:
+        padding_value = pipe.tokenizer.pad_token_id if key == "input_ids" else 0
+        batch[key] = pad_sequence(
+            [chunk[key][0] for chunk in chunks],
+            batch_first=True,
+            padding_value=padding_value
+        )
+
+    with torch.inference_mode():
+        outputs = (model or pipe.model)(**batch)
+
+    results = []
+    for row, (chunk, length) in enumerate(zip(chunks, lengths)):
+        results.append({
+            "start_logits": outputs.start_logits[row:row + 1, :length].numpy(),
+            "end_logits": outputs.end_logits[row:row + 1, :length].numpy(),
+            "p_mask": chunk["p_mask"],
+            "word_ids": chunk["word_ids"],
+            "words": chunk["words"],
+            "attention_mask": chunk["attention_mask"],
+            "is_last": chunk["is_last"],
+        })
+    return results
+
+
+def padding_ratio():
+    """Fraction of all batched tokens so far that were padding."""
+    return metrics.ratio("inference_padding_tokens", "inference_tokens")
+
+
+def run_bucketed(pipe, chunks, batch_size, model=None, cancel=None):
+    """Run ``chunks`` in length-sorted batches of ``batch_size``.
+
+    Sorting before batching groups chunks of similar length, so each batch
+    is padded only to its own longest member. Returns one output (or the
+    exception raised by its batch) per chunk, in the original order; chunks
+    left unrun because ``cancel`` was set get ``None``.
+    """
+    order = sorted(range(len(chunks)), key=lambda i: chunks[i]["input_ids"].shape[1])
+    outputs = [None] * len(chunks)
+    for start in range(0, len(order), batch_size):
+        if cancel is not None and cancel.cancelled:
+            break
+        bucket = order[start:start + batch_size]
+        try:
+            bucket_outputs = run_batch(pipe, [chunks[i] for i in bucket], model=model)
+        except Exception as e:
+            bucket_outputs = [e] * len(bucket)
+        for i, output in zip(bucket, bucket_outputs):
+            outputs[i] = output
+    return outputs
+
+
+def answer_pages(pipe, question, pages, batch_size=8, bucket_batches=4, model=None,
+                 cancel=None, server=None, first_window=None, on_window=None, **kwargs):
+    """Answer ``question`` on each ``(page_index, word_boxes)`` in ``pages``.
+
+    Pages are encoded in windows of about ``batch_size * bucket_batches``
+    chunks; each window is length-bucketed into forward passes of
+    ``batch_size`` chunks, run on ``model`` (default ``pipe.model``), or
+    handed to the shared ``inference_server.InferenceServer`` ``server``,
+    which batches them with other callers' chunks. ``kwargs`` are the usual
+    pipeline call arguments (``top_k``, ...), interpreted exactly as
+    ``pipe(...)`` would. Yields
+    ``(page_index, answers, error)`` in input order as each window completes.
+    ``first_window`` shrinks the first window to that many chunks, so the
+    first pages are answered after a single small forward pass.
+    ``on_window(results)`` receives each completed window's results before
+    any of them are yielded, even if the caller stops consuming early.
+
+    Setting the ``cancel`` token stops the search before the next page is
+    encoded or the next batch runs; the unfinished window is dropped.
+    """
+    preprocess_params, _, postprocess_params = pipe._sanitize_parameters(**kwargs)
+    window_size = batch_size * max(1, bucket_batches)
+    next_window = first_window or window_size
+    pages = iter(pages)
+    exhausted = False
+    while not exhausted:
+        encoded, chunk_count = [], 0
+        while chunk_count < next_window:
+            if cancel is not None and cancel.cancelled:
+                return
+            page = next(pages, None)
+            if page is None:
+                exhausted = True
+                break
+            page_index, word_boxes = page
+            try:
+                chunks = encode_page(pipe, question, word_boxes, preprocess_params)
+            except Exception as e:
+                encoded.append((page_index, e))
+                continue
+            encoded.append((page_index, chunks))
+            chunk_count += len(chunks)
+
+        next_window = window_size
+        window_chunks = [
+            chunk for _, chunks in encoded if isinstance(chunks, list) for chunk in chunks
+        ]
+        if server is not None:
+            outputs = server.run(window_chunks, cancel=cancel)
+        else:
+            outputs = run_bucketed(pipe, window_chunks, batch_size, model=model, cancel=cancel)
+        if cancel is not None and cancel.cancelled:
+            return
+
+        results = []
+        offset = 0
+        for page_index, chunks in encoded:
+            if isinstance(chunks, Exception):
+                results.append((page_index, None, chunks))
+                continue
+            page_outputs = outputs[offset:offset + len(chunks)]
+            offset += len(chunks)
+            error = next((output for output in page_outputs if isinstance(output, Exception)), None)
+            if error is not None:
+                results.append((page_index, None, error))
+                continue
+            try:
+                results.append((page_index, pipe.postprocess(page_outputs, **postprocess_params), None))
+            except Exception as e:
+                results.append((page_index, None, e))
+        if on_window is not None:
+            on_window(results)
+        yield from results
+
+
+def warm_up(pipe, model=None, lengths=(64, 256, 512), batch_sizes=(1, 8)):
+    """Run synthetic batches through the tokenizer and model; return the seconds spent.
+
+    Covering representative sequence lengths and batch sizes triggers lazy
+    kernel initialization and allocator growth before the first real query.
+    """
+    start = time.perf_counter()
+    preprocess_params, _, _ = pipe._sanitize_parameters()
+    for length in lengths:
+        word_boxes = [("warmup", [0, 0, 10, 10])] * length
+        chunk = encode_page(pipe, "What is the warm-up?", word_boxes, preprocess_params)[0]
+        for batch_size in batch_sizes:
+            run_batch(pipe, [chunk] * batch_size, model=model)
+    elapsed = time.perf_counter() - start
+    metrics.set("warmup_seconds", round(elapsed, 3))
+    return elapsed
@@ -0,0 +1,125 @@
+"""Micro-batching of forward passes across concurrent searches.
+
+Every search thread (Streamlit sessions, API requests) hands its encoded
+chunks to one shared ``InferenceServer``. Its worker thread gathers chunks
+from all callers for at most ``max_wait`` seconds, runs them length-bucketed
+through the model and resolves each caller's futures, so concurrent users
+share full batches instead of competing with small ones for the same cores.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from inference import run_bucketed
+from metrics import metrics
+
+# How often a caller waiting on its chunks checks its cancel token, in seconds
+_CANCEL_POLL_SECONDS = 0.05
+
+
+class InferenceServer:
+    """Runs chunks submitted from any thread in shared, length-bucketed batches.
+
+    A gathering window opens when a chunk arrives on an idle queue and closes
+    after ``max_wait`` seconds or once ``batch_size * bucket_batches`` chunks
+    are collected, which caps the delay added to any one request.
+    """
+
+    def __init__(self, pipe, model=None, batch_size=8, bucket_batches=4, max_wait=0.005):
+        self.pipe = pipe
+        self.model = model
+        self.batch_size = batch_size
+        self.window_size = batch_size * max(1, bucket_batches)
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._serve, name="docqa-inference", daemon=True)
+        self._thread.start()
+
+    def submit(self, chunks):
+        """Queue ``chunks``; return one ``Future`` per chunk for its model output."""
+        futures = []
+        for chunk in chunks:
+            future = Future()
+            self._queue.put((chunk, future, time.perf_counter()))
+            futures.append(future)
+        metrics.set("inference_queue_depth", self._queue.qsize())
+        return futures
+
+    def run(self, chunks, cancel=None):
+        """Run ``chunks`` and wait for them, like ``inference.run_bucketed``.
+
+        Returns one output (or the exception raised by its batch) per chunk,
+        in order. Once ``cancel`` is set, chunks not yet running are
+        withdrawn and get ``None``.
+        """
+        futures = self.submit(chunks)
+        pending = set(futures)
+        while pending:
+            if cancel is not None and cancel.cancelled:
+                for future in pending:
+                    future.cancel()
+                break
+            _, pending = wait(pending, timeout=_CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+
+        outputs = []
+        for future in futures:
+            if future.cancelled() or not future.done():
+                outputs.append(None)
+            elif future.exception() is not None:
+                outputs.append(future.exception())
+            else:
+                outputs.append(future.result())
+        return outputs
+
+    def _gather(self):
+        # Block for the first chunk, then collect others until the window closes
+        requests = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(requests) < self.window_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                requests.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return requests
+
+    def _serve(self):
+        while True:
+            requests = self._gather()
+            started = time.perf_counter()
+            # Skip chunks whose callers cancelled while they were queued
+            requests = [
+                (chunk, future, queued)
+                for chunk, future, queued in requests
+                if future.set_running_or_notify_cancel()
+            ]
+            if not requests:
+                continue
+            metrics.increment("inference_requests", len(requests))
+            metrics.increment(
+                "inference_queue_seconds",
+                sum(started - queued for _, _, queued in requests)
+            )
+            metrics.set("inference_queue_depth", self._queue.qsize())
+            try:
+                outputs = run_bucketed(
+                    self.pipe,
+                    [chunk for chunk, _, _ in requests],
+                    self.batch_size,
+                    model=self.model
+                )
+            except Exception as e:
+                outputs = [e] * len(requests)
+            for (_, future, _), output in zip(requests, outputs):
+                if isinstance(output, Exception):
+                    future.set_exception(output)
+                else:
+                    future.set_result(output)
+
+
+def mean_queue_seconds():
+    """Average time chunks spent queued before their batch started."""
+    return metrics.ratio("inference_queue_seconds", "inference_requests")
@@ -0,0 +1,113 @@
+"""Searches that run on a background thread while the UI polls their progress."""
+import threading
+import time
+
+from inference import CancelToken
+
+
+def answer_key(answer):
+    """Stable identifier of an answer within one search's results."""
+    return f"{answer['page']}:{answer['answer']}"
+
+
+class SearchJob:
+    """Runs ``engine.search`` on a daemon thread, collecting pages as they finish.
+
+    The UI thread reads ``snapshot()`` at any time to render the answers found
+    so far, best first, while later pages are still being searched, and can
+    ``cancel()`` the search, which stops it between pages and batches.
+
+    Until the engine admits the search, ``queue_position`` is its place in
+    the queue of searches waiting for a slot.
+
+    A finished job is the stored result of its search: it is re-rendered on
+    later reruns without touching the model, and user ``feedback`` on its
+    answers is recorded on it.
+    """
+
+    def __init__(self, engine, document, question, mode, limit=None):
+        self.engine = engine
+        self.document = document
+        self.question = question
+        self.mode = mode
+        self.limit = limit
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self._answers = []
+        self._page_errors = []
+        self._pages_searched = 0
+        self._planned_pages = 0
+        self.degraded = False
+        self.ticket = None
+        self.feedback = {}
+        self.cancel_token = CancelToken()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="docqa-search", daemon=True)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread.start()
+        return self
+
+    @property
+    def queue_position(self):
+        """1-based place among searches waiting for a slot, or ``None``."""
+        ticket = self.ticket
+        return ticket.position if ticket is not None else None
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def reusable(self):
+        """Whether the job completed normally, so its results can be shown again.
+
+        Searches degraded to Quick mode under load are run again in full.
+        """
+        return self.done and not self.cancelled and self.error is None and not self.degraded
+
+    @property
+    def cancelled(self):
+        return self.cancel_token.cancelled
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def snapshot(self):
+        """Return ``(answers, page_errors, pages_searched, planned_pages)`` as of now.
+
+        Answers are sorted best first.
+        """
+        with self._lock:
+            answers = sorted(self._answers, key=lambda x: x['score'], reverse=True)
+            return answers, list(self._page_errors), self._pages_searched, self._planned_pages
+
+    def record_feedback(self, answer, helpful):
+        """Record whether ``answer`` (one of this job's answers) was helpful."""
+        self.feedback[answer_key(answer)] = helpful
+
+    def _run(self):
+        try:
+            self.ticket = self.engine.search_admission.enter()
+            for result in self.engine.search(
+                self.document, self.question, self.mode, cancel=self.cancel_token,
+                limit=self.limit, ticket=self.ticket
+            ):
+                with self._lock:
+                    self._pages_searched += 1
+                    self._planned_pages = result.planned_pages
+                    self.degraded = result.degraded
+                    if result.error is not None:
+                        self._page_errors.append((result.page_index, result.error))
+                    self._answers.extend(result.answers)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished_at = time.perf_counter()
+            self._done.set()
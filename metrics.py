@@ -0,0 +1,35 @@
+"""Process-wide counters, shown in the Debug Information panel."""
+import threading
+
+
+class Metrics:
+    """Thread-safe named counters and gauges."""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def set(self, name, value):
+        with self._lock:
+            self._values[name] = value
+
+    def get(self, name, default=0):
+        with self._lock:
+            return self._values.get(name, default)
+
+    def ratio(self, numerator, denominator):
+        """Return ``numerator / denominator``, or 0.0 before anything is counted."""
+        with self._lock:
+            total = self._values.get(denominator, 0)
+            return self._values.get(numerator, 0) / total if total else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return dict(sorted(self._values.items()))
+
+
+metrics = Metrics()
@@ -0,0 +1,123 @@
+"""Tesseract OCR producing the word boxes the QA pipeline consumes.
+
+This module is what spawned OCR workers import, so it stays free of torch
+and transformers; only ``pytesseract`` is loaded, on first use.
+"""
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from metrics import metrics
+from ocr_store import ocr_config_key, page_hash
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def ocr_page(image, lang=None, tesseract_config=""):
+    """OCR a page image into ``(word, [x0, y0, x1, y1])`` pairs.
+
+    Mirrors the ``apply_tesseract`` call the document-question-answering
+    pipeline makes internally (blank words dropped, boxes scaled to 0-1000),
+    so precomputed boxes match what it would derive itself.
+    """
+    try:
+        import pytesseract
+    except ImportError:
+        raise ValueError("OCR requires pytesseract, but it is not available")
+    data = pytesseract.image_to_data(
+        image, lang=lang, output_type="dict", config=tesseract_config
+    )
+    width, height = image.size
+    word_boxes = []
+    for word, left, top, w, h in zip(
+        data["text"], data["left"], data["top"], data["width"], data["height"]
+    ):
+        if not word.strip():
+            continue
+        word_boxes.append((word, [
+            int(1000 * (left / width)),
+            int(1000 * (top / height)),
+            int(1000 * ((left + w) / width)),
+            int(1000 * ((top + h) / height)),
+        ]))
+    return word_boxes
+
+
+def _init_worker(thread_limit):
+    # Tesseract reads this when each worker spawns it; one OpenMP thread per
+    # worker keeps the pool from oversubscribing the cores
+    os.environ["OMP_THREAD_LIMIT"] = str(thread_limit)
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # Spawned workers avoid forking the multi-threaded server process
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(1,)
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def _resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def ocr_pages(images, workers=None, lang=None, tesseract_config="", store=None):
+    """OCR ``images`` across a shared process pool, yielding results in order.
+
+    Images are consumed lazily and at most two per worker are in flight, so
+    pages can be rendered while earlier ones are being recognized. When an
+    ``OcrStore`` is given, pages already recognized with the same settings
+    are served from it and new results are written back. A page Tesseract
+    fails on yields no words (``[]``) instead of stopping the others.
+    """
+    workers = workers or os.cpu_count() or 1
+    config = ocr_config_key(lang, tesseract_config)
+    pool = _get_pool(workers) if workers > 1 else None
+    pending = deque()
+
+    def finish():
+        key, future = pending.popleft()
+        try:
+            word_boxes = future.result()
+        except Exception:
+            # One unreadable page must not fail the document; it is left
+            # without words (and not stored, so it is retried next time)
+            metrics.increment("ocr_page_errors")
+            return []
+        if store is not None and key is not None:
+            store.put(key, config, word_boxes)
+        return word_boxes
+
+    for image in images:
+        key = page_hash(image) if store is not None else None
+        word_boxes = store.get(key, config) if key is not None else None
+        if word_boxes is not None:
+            pending.append((None, _resolved(word_boxes)))
+        elif pool is None:
+            future = Future()
+            try:
+                future.set_result(ocr_page(image, lang, tesseract_config))
+            except Exception as e:
+                future.set_exception(e)
+            pending.append((key, future))
+        else:
+            pending.append((key, pool.submit(ocr_page, image, lang, tesseract_config)))
+        if len(pending) >= 2 * workers:
+            yield finish()
+    while pending:
+        yield finish()
@@ -0,0 +1,65 @@
+"""Persistent SQLite store of OCR results keyed by page image content."""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+
+def page_hash(image):
+    """Return a hex BLAKE2b digest of a page image's mode, size and pixels."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def ocr_config_key(lang, tesseract_config):
+    """Identify the OCR settings a stored result was produced with."""
+    return f"lang={lang or ''};config={tesseract_config or ''}"
+
+
+class OcrStore:
+    """Maps ``(page hash, OCR config)`` to word boxes across sessions and restarts.
+
+    The database is opened in WAL mode so several Streamlit processes can
+    share one file.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS ocr ("
+                " page_hash TEXT NOT NULL,"
+                " config TEXT NOT NULL,"
+                " word_boxes TEXT NOT NULL,"
+                " PRIMARY KEY (page_hash, config))"
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM ocr").fetchone()[0]
+
+    def get(self, page_hash, config):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT word_boxes FROM ocr WHERE page_hash = ? AND config = ?",
+                (page_hash, config)
+            ).fetchone()
+        if row is None:
+            return None
+        return [(word, box) for word, box in json.loads(row[0])]
+
+    def put(self, page_hash, config, word_boxes):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO ocr (page_hash, config, word_boxes) VALUES (?, ?, ?)",
+                (page_hash, config, json.dumps(word_boxes))
+            )
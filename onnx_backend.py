@@ -0,0 +1,84 @@
+"""ONNX Runtime execution of the question-answering model.
+
+The pipeline's PyTorch model is exported to ONNX once and cached on disk;
+``OnnxQAModel`` then stands in for ``pipe.model`` in the batched inference
+path. Requires the optional ``onnxruntime`` package.
+"""
+import os
+import re
+
+import onnxruntime
+import torch
+from transformers.modeling_outputs import QuestionAnsweringModelOutput
+
+_INPUT_NAMES = ("input_ids", "bbox", "attention_mask", "token_type_ids")
+_OUTPUT_NAMES = ("start_logits", "end_logits")
+
+
+def onnx_model_path(pipe, cache_dir):
+    """Return where the ONNX export of ``pipe``'s model is cached."""
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "--", pipe.model.name_or_path)
+    return os.path.join(cache_dir, f"{name}.onnx")
+
+
+def export_onnx(pipe, path):
+    """Export ``pipe.model`` to ``path`` with dynamic batch and sequence axes."""
+    sample = next(pipe.preprocess({
+        "question": "What is the total?",
+        "image": None,
+        "word_boxes": [("Total", [0, 0, 100, 20]), ("42.00", [120, 0, 200, 20])],
+    }))
+    inputs = {name: sample[name] for name in _INPUT_NAMES if name in sample}
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in inputs}
+    dynamic_axes.update({name: {0: "batch", 1: "sequence"} for name in _OUTPUT_NAMES})
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    pipe.model.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            pipe.model,
+            (inputs,),
+            temp_path,
+            input_names=list(inputs),
+            output_names=list(_OUTPUT_NAMES),
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    # Concurrent exporters each write their own file; the last rename wins
+    os.replace(temp_path, path)
+
+
+class OnnxQAModel:
+    """Callable with the same inputs and logits outputs as the PyTorch model."""
+
+    def __init__(self, path, threads=0):
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads
+        self.path = path
+        self.session = onnxruntime.InferenceSession(
+            path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [node.name for node in self.session.get_inputs()]
+
+    def __call__(self, **inputs):
+        feed = {name: inputs[name].numpy() for name in self.input_names}
+        start_logits, end_logits = self.session.run(list(_OUTPUT_NAMES), feed)
+        return QuestionAnsweringModelOutput(
+            start_logits=torch.from_numpy(start_logits),
+            end_logits=torch.from_numpy(end_logits)
+        )
+
+
+def load_onnx_model(pipe, cache_dir, threads=0):
+    """Return an ``OnnxQAModel`` for ``pipe``, exporting it on first use.
+
+    ``threads`` caps ONNX Runtime's intra-op threads (0 uses every core).
+    """
+    path = onnx_model_path(pipe, cache_dir)
+    if not os.path.exists(path):
+        export_onnx(pipe, path)
+    return OnnxQAModel(path, threads=threads)
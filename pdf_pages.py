@@ -0,0 +1,247 @@
+"""Lazy, cached access to the rasterized pages of a PDF document."""
+import math
+import os
+import subprocess
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from pdf2image.exceptions import PDFPageCountError, PopplerNotInstalledError
+from pdf2image.parsers import parse_buffer_to_ppm
+
+_COPY_CHUNK_SIZE = 1 << 20
+
+
+class PopplerError(RuntimeError):
+    """A poppler utility exited with an error."""
+
+
+def _remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class PdfSource:
+    """The bytes of an uploaded PDF, as handed to the poppler utilities.
+
+    Small documents stay in memory: ``data`` is kept as a ``memoryview`` of
+    the caller's buffer (e.g. the ``bytes`` from ``UploadedFile.getvalue()``;
+    ``getbuffer()`` on a ``BytesIO`` would copy it) and piped to poppler on
+    stdin, so no extra copy is made and the filesystem is never touched.
+    Documents larger than ``spool_threshold`` bytes are written once to a
+    temporary file that is deleted when the source is garbage collected, so
+    repeated range renders do not re-pipe the whole file.
+    """
+
+    def __init__(self, data, spool_threshold=64 << 20):
+        view = memoryview(data)
+        self.nbytes = view.nbytes
+        self.path = None
+        self.data = None
+        if self.nbytes > spool_threshold:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+                for offset in range(0, self.nbytes, _COPY_CHUNK_SIZE):
+                    temp_file.write(view[offset:offset + _COPY_CHUNK_SIZE])
+                self.path = temp_file.name
+            weakref.finalize(self, _remove_file, self.path)
+        else:
+            self.data = view
+
+    def run(self, command, options=(), trailing=()):
+        """Run a poppler ``command`` on this PDF and return its stdout bytes."""
+        if self.path is not None:
+            location, stdin = self.path, None
+        else:
+            # Poppler reads the document from stdin when given "-"
+            location, stdin = "-", self.data
+        try:
+            result = subprocess.run(
+                [command, *options, location, *trailing],
+                input=stdin,
+                capture_output=True
+            )
+        except FileNotFoundError as e:
+            raise PopplerNotInstalledError(
+                f"Unable to run {command}. Is poppler installed and in PATH?"
+            ) from e
+        if result.returncode != 0:
+            message = result.stderr.decode("utf8", "ignore").strip()
+            raise PopplerError(f"{command} failed: {message}")
+        return result.stdout
+
+
+def page_count(source):
+    """Return the number of pages of ``source`` as reported by pdfinfo."""
+    output = source.run("pdfinfo").decode("utf8", "ignore")
+    for line in output.splitlines():
+        key, _, value = line.partition(":")
+        if key.strip() == "Pages":
+            return int(value)
+    raise PDFPageCountError(f"Unable to get page count.\n{output}")
+
+
+def render_pages(source, first_page, last_page, dpi=300, size=None):
+    """Rasterize the 1-based, inclusive page range with pdftoppm."""
+    options = ["-r", str(dpi), "-f", str(first_page), "-l", str(last_page)]
+    if size is not None:
+        options += ["-scale-to", str(int(size))]
+    # Without an output root pdftoppm streams concatenated PPM images to stdout
+    return parse_buffer_to_ppm(source.run("pdftoppm", options))
+
+
+def shard_page_range(start, stop, shards, align=1):
+    """Split ``[start, stop)`` into at most ``shards`` contiguous ranges.
+
+    Range boundaries are rounded up to multiples of ``align`` so shards line
+    up with the render chunks used by ``LazyPages``.
+    """
+    count = stop - start
+    if count <= 0:
+        return []
+    step = math.ceil(count / max(1, shards))
+    step = math.ceil(step / align) * align
+    return [(first, min(first + step, stop)) for first in range(start, stop, step)]
+
+
+class LazyPages(Sequence):
+    """Read-only sequence of page images that renders pages on first access.
+
+    Only the page count is read up front. Indexing a page rasterizes the
+    ``chunk_size`` pages around it with a single ``first_page``/``last_page``
+    poppler call and keeps the result in a least-recently-used cache holding
+    at most ``cache_size`` images.
+
+    When ``size`` is given, poppler scales each page so its longest side is
+    ``size`` pixels (``-scale-to``), producing images already sized for the
+    model instead of rendering at ``dpi`` and downscaling afterwards.
+
+    ``prefetch`` renders a whole page range up front, sharded across
+    ``workers`` concurrent poppler processes; iterating the sequence (or
+    ``iter_pages``) prefetches one cache-sized window at a time.
+
+    ``source`` is a ``PdfSource``.
+    """
+
+    def __init__(self, source, dpi=300, size=None, cache_size=32, chunk_size=4,
+                 workers=1):
+        self.source = source
+        self.dpi = dpi
+        self.size = size
+        self.chunk_size = max(1, chunk_size)
+        self.cache_size = max(self.chunk_size, cache_size)
+        self.workers = max(1, workers)
+        self._page_count = page_count(source)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._page_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("page index out of range")
+
+        with self._lock:
+            page = self._cache.get(index)
+            if page is not None:
+                self._cache.move_to_end(index)
+                return page
+
+        first = index - index % self.chunk_size
+        last = min(first + self.chunk_size, len(self))
+        images = self._render_range(first, last)
+        self._store(first, images)
+        return images[index - first]
+
+    def __iter__(self):
+        return self.iter_pages(range(len(self)))
+
+    def iter_pages(self, indices):
+        """Yield the pages at ``indices`` (ascending), prefetching each window.
+
+        Only the requested pages are rendered, one run of consecutive
+        indices at a time, so the pages between sparse indices are neither
+        rendered nor pushed into the cache.
+        """
+        indices = list(indices)
+        for position in range(0, len(indices), self.cache_size):
+            window = indices[position:position + self.cache_size]
+            self._prefetch_indices(window)
+            for index in window:
+                yield self[index]
+
+    def prefetch(self, start=0, stop=None, progress=None):
+        """Render pages ``[start, stop)`` concurrently into the cache.
+
+        The range is capped to the cache size and split into one shard per
+        worker. ``progress(rendered, total)`` is called from the calling
+        thread each time a shard finishes.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        stop = min(stop, start + self.cache_size)
+        with self._lock:
+            missing = [i for i in range(start, stop) if i not in self._cache]
+        if not missing:
+            return
+
+        start, stop = missing[0], missing[-1] + 1
+        self._render_ranges(
+            shard_page_range(start, stop, self.workers, align=self.chunk_size),
+            progress
+        )
+
+    def _prefetch_indices(self, indices):
+        with self._lock:
+            missing = [i for i in indices if i not in self._cache]
+        runs = []
+        for index in missing:
+            if runs and runs[-1][1] == index:
+                runs[-1][1] = index + 1
+            else:
+                runs.append([index, index + 1])
+        # Long runs are still split so every worker has a shard
+        shards = max(1, self.workers // max(1, len(runs)))
+        self._render_ranges([
+            shard for first, last in runs for shard in shard_page_range(first, last, shards)
+        ])
+
+    def _render_ranges(self, ranges, progress=None):
+        if not ranges:
+            return
+        total = sum(last - first for first, last in ranges)
+        rendered = 0
+        with ThreadPoolExecutor(max_workers=min(len(ranges), self.workers)) as executor:
+            futures = {
+                executor.submit(self._render_range, first, last): first
+                for first, last in ranges
+            }
+            # Shards complete out of order; each one is stored at its own offset
+            for future in as_completed(futures):
+                images = future.result()
+                self._store(futures[future], images)
+                rendered += len(images)
+                if progress is not None:
+                    progress(rendered, total)
+
+    def render_high_resolution(self, index, dpi=300):
+        """Render a single page at ``dpi``, bypassing the cache (used for zoom)."""
+        return render_pages(self.source, index + 1, index + 1, dpi=dpi)[0]
+
+    def _render_range(self, first, last):
+        # Each call runs its own pdftoppm process, so threads render in parallel
+        return render_pages(self.source, first + 1, last, dpi=self.dpi, size=self.size)
+
+    def _store(self, first, images):
+        with self._lock:
+            for offset, image in enumerate(images):
+                self._cache[first + offset] = image
+                self._cache.move_to_end(first + offset)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -0,0 +1,45 @@
+"""Dynamic int8 quantization of the QA model and its comparison to fp32."""
+import time
+
+import torch
+
+from inference import answer_pages
+
+
+def quantize_model(model):
+    """Return a copy of ``model`` with its Linear layers dynamically quantized to int8."""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def compare_models(pipe, reference, candidate, pages, questions, **kwargs):
+    """Time ``reference`` and ``candidate`` on the same questions and pages.
+
+    ``pages`` are ``(page_index, word_boxes)`` pairs and ``kwargs`` are
+    passed to ``answer_pages``. Returns one row per question with both
+    latencies and the fraction of pages whose top answer is identical.
+    """
+    rows = []
+    for question in questions:
+        timings, top_answers = [], []
+        for model in (reference, candidate):
+            start = time.perf_counter()
+            results = list(answer_pages(pipe, question, pages, model=model, **kwargs))
+            timings.append(time.perf_counter() - start)
+            top_answers.append({
+                page_index: answers[0]["answer"] if answers else None
+                for page_index, answers, error in results if error is None
+            })
+
+        reference_answers, candidate_answers = top_answers
+        agreement = sum(
+            candidate_answers.get(page_index) == answer
+            for page_index, answer in reference_answers.items()
+        ) / max(1, len(reference_answers))
+        rows.append({
+            "question": question,
+            "reference_seconds": round(timings[0], 3),
+            "candidate_seconds": round(timings[1], 3),
+            "speedup": round(timings[0] / timings[1], 2) if timings[1] else None,
+            "top_answer_agreement": round(agreement, 3),
+        })
+    return rows
@@ -0,0 +1,175 @@
+"""Page ranking used to decide which pages the model reads first."""
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return [token.lower() for token in _TOKEN_RE.findall(text)]
+
+
+class Bm25Index:
+    """Okapi BM25 over the words of each page of a document."""
+
+    def __init__(self, pages, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokens) for tokens in pages]
+        self.lengths = [len(tokens) for tokens in pages]
+        self.average_length = sum(self.lengths) / len(pages) if pages else 0.0
+        document_freqs = Counter(term for freqs in self.term_freqs for term in freqs)
+        count = len(pages)
+        self.idf = {
+            term: math.log(1 + (count - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_freqs.items()
+        }
+
+    @classmethod
+    def from_word_boxes(cls, word_boxes):
+        """Index each page's words, as stored in ``Document.word_boxes``."""
+        return cls([
+            [token for word, _ in boxes or () for token in tokenize(word)]
+            for boxes in word_boxes
+        ])
+
+    def scores(self, query):
+        """Return the BM25 score of every page for ``query``."""
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scores = []
+        for freqs, length in zip(self.term_freqs, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1))
+            scores.append(sum(
+                self.idf[term] * freqs[term] * (self.k1 + 1) / (freqs[term] + norm)
+                for term in terms if term in freqs
+            ))
+        return scores
+
+    def rank(self, query, pages=None):
+        """Return ``pages`` (default: all) ordered by score, ties in page order."""
+        scores = self.scores(query)
+        pages = range(len(scores)) if pages is None else pages
+        return sorted(pages, key=lambda i: (-scores[i], i))
+
+
+def char_ngrams(text, ngram_range=(3, 5)):
+    """Return the character n-grams of each word of ``text``, padded with spaces."""
+    low, high = ngram_range
+    grams = []
+    for token in tokenize(text):
+        token = f" {token} "
+        for n in range(low, high + 1):
+            grams.extend(token[i:i + n] for i in range(len(token) - n + 1))
+    return grams
+
+
+class SemanticIndex:
+    """Latent semantic page index: character n-gram TF-IDF reduced by truncated SVD.
+
+    Character n-grams match inflections and partial words ("terminate",
+    "termination"), and the low-rank projection lets n-grams that co-occur
+    across pages stand in for each other. Everything is computed locally
+    with NumPy; scoring a question is one matrix-vector product.
+
+    The TF-IDF matrix is never held densely: the Gram matrix and the
+    projection are accumulated ``block_size`` vocabulary columns at a time,
+    and the vocabulary is capped at ``features_per_page`` n-grams per page.
+    """
+
+    def __init__(self, pages, dimensions=128, max_features=20000, ngram_range=(3, 5),
+                 features_per_page=50, block_size=2048):
+        self.ngram_range = ngram_range
+        counts = [Counter(char_ngrams(text, ngram_range)) for text in pages]
+        document_freqs = Counter(gram for page_counts in counts for gram in page_counts)
+        # Short documents cannot use a large vocabulary, only carry its weight
+        max_features = min(max_features, max(1000, features_per_page * len(pages)))
+        vocabulary = [gram for gram, _ in document_freqs.most_common(max_features)]
+        self.vocabulary = {gram: column for column, gram in enumerate(vocabulary)}
+        self.idf = np.array([
+            math.log((1 + len(pages)) / (1 + document_freqs[gram])) + 1 for gram in vocabulary
+        ], dtype=np.float32)
+
+        # The weighted, normalized pages x vocabulary matrix is kept sparse, as
+        # (row, column, value) entries sorted by column
+        rows, columns, values = [], [], []
+        for row, page_counts in enumerate(counts):
+            page_columns = np.array(
+                [self.vocabulary[gram] for gram in page_counts if gram in self.vocabulary],
+                dtype=np.int64
+            )
+            page_values = np.array(
+                [1 + math.log(count) for gram, count in page_counts.items()
+                 if gram in self.vocabulary],
+                dtype=np.float32
+            ) * self.idf[page_columns]
+            norm = np.linalg.norm(page_values)
+            rows.append(np.full(len(page_columns), row, dtype=np.int64))
+            columns.append(page_columns)
+            values.append(page_values / norm if norm else page_values)
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        columns = np.concatenate(columns) if columns else np.zeros(0, dtype=np.int64)
+        values = np.concatenate(values) if values else np.zeros(0, dtype=np.float32)
+        order = np.argsort(columns, kind="stable")
+        rows, columns, values = rows[order], columns[order], values[order]
+
+        def column_blocks():
+            # Dense pages x block_size slices of the matrix, one at a time
+            for first in range(0, len(vocabulary), block_size):
+                last = min(first + block_size, len(vocabulary))
+                start, stop = np.searchsorted(columns, [first, last])
+                block = np.zeros((len(pages), last - first), dtype=np.float32)
+                block[rows[start:stop], columns[start:stop] - first] = values[start:stop]
+                yield first, last, block
+
+        # Truncated SVD through the small pages x pages Gram matrix:
+        # matrix = U S V^T, so V = matrix^T U / S and page vectors are U S
+        gram_matrix = np.zeros((len(pages), len(pages)), dtype=np.float32)
+        for _, _, block in column_blocks():
+            gram_matrix += block @ block.T
+        eigenvalues, eigenvectors = np.linalg.eigh(gram_matrix)
+        keep = np.argsort(eigenvalues)[::-1][:dimensions]
+        keep = keep[eigenvalues[keep] > 1e-6]
+        singular_values = np.sqrt(eigenvalues[keep])
+        left_vectors = eigenvectors[:, keep]
+        self.components = np.zeros((len(vocabulary), len(keep)), dtype=np.float32)
+        for first, last, block in column_blocks():
+            self.components[first:last] = (block.T @ left_vectors) / singular_values
+        self.page_vectors = self._normalize(left_vectors * singular_values)
+
+    @classmethod
+    def from_word_boxes(cls, word_boxes, **kwargs):
+        """Index each page's words, as stored in ``Document.word_boxes``."""
+        return cls([" ".join(word for word, _ in boxes or ()) for boxes in word_boxes], **kwargs)
+
+    @staticmethod
+    def _normalize(vectors):
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def scores(self, query):
+        """Return the cosine similarity of every page to ``query`` in the latent space."""
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for gram, count in Counter(char_ngrams(query, self.ngram_range)).items():
+            column = self.vocabulary.get(gram)
+            if column is not None:
+                vector[column] = 1 + math.log(count)
+        latent = self._normalize(self._normalize(vector * self.idf) @ self.components)
+        return (self.page_vectors @ latent).tolist()
+
+    def rank(self, query, pages=None):
+        """Return ``pages`` (default: all) ordered by similarity, ties in page order."""
+        scores = self.scores(query)
+        pages = range(len(scores)) if pages is None else pages
+        return sorted(pages, key=lambda i: (-scores[i], i))
+
+
+def fuse_rankings(rankings, k=60):
+    """Combine several orderings of the same pages by reciprocal rank fusion."""
+    fused = Counter()
+    for ranking in rankings:
+        for position, page in enumerate(ranking):
+            fused[page] += 1 / (k + position + 1)
+    return sorted(fused, key=lambda page: (-fused[page], page))
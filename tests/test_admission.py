@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+
+
+class Flag:
+    """Stand-in for ``inference.CancelToken`` (which needs torch)."""
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def wait_in_thread(ticket, **kwargs):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(ticket.wait(**kwargs)))
+    thread.start()
+    return thread, result
+
+
+def test_admits_up_to_max_active_then_queues_in_order():
+    controller = AdmissionController("test", max_active=1)
+    first, second, third = controller.enter(), controller.enter(), controller.enter()
+    assert first.admitted and first.position is None
+    assert (second.position, third.position) == (1, 2)
+    assert (second.backlog, third.backlog) == (0, 1)
+
+    first.release()
+    assert second.admitted and third.position == 1
+    assert controller.active == 1 and controller.queued == 1
+
+
+def test_sheds_when_queue_is_full():
+    controller = AdmissionController("test", max_active=1, max_queued=1)
+    controller.enter()
+    controller.enter()
+    assert controller.full
+    with pytest.raises(Overloaded):
+        controller.enter()
+
+
+def test_wait_reports_positions_until_admitted():
+    controller = AdmissionController("test", max_active=1)
+    first, second, third = controller.enter(), controller.enter(), controller.enter()
+    positions = []
+    thread, result = wait_in_thread(third, on_position=positions.append)
+    time.sleep(0.05)
+    second.release()
+    time.sleep(0.05)
+    first.release()
+    thread.join(2)
+    assert result == [True]
+    assert positions == [2, 1]
+
+
+def test_wait_returns_false_when_cancelled():
+    controller = AdmissionController("test", max_active=1)
+    controller.enter()
+    ticket = controller.enter()
+    cancel = Flag()
+    thread, result = wait_in_thread(ticket, cancel=cancel)
+    cancel.cancel()
+    thread.join(2)
+    assert result == [False]
+
+
+def test_wait_returns_false_when_released_by_another_thread():
+    controller = AdmissionController("test", max_active=1)
+    controller.enter()
+    ticket = controller.enter()
+    thread, result = wait_in_thread(ticket)
+    time.sleep(0.05)
+    ticket.release()
+    thread.join(2)
+    assert result == [False]
+    assert controller.queued == 0
+
+
+def test_release_is_idempotent():
+    controller = AdmissionController("test", max_active=2)
+    ticket = controller.enter()
+    ticket.release()
+    ticket.release()
+    assert controller.active == 0
+
+
+def test_admits_without_queueing_even_when_queueing_is_disabled():
+    controller = AdmissionController("test", max_active=1, max_queued=0)
+    ticket = controller.enter()
+    assert ticket.admitted
+    with pytest.raises(Overloaded):
+        controller.enter()
@@ -0,0 +1,67 @@
+import numpy as np
+
+from answer_cache import AnswerCache, cache_key, normalize_question
+
+ANSWER = [{"score": np.float32(0.5), "answer": "x" * 40, "start": np.int64(1), "end": 2}]
+
+
+def key(page, question="What is the total?"):
+    return cache_key("doc", page, question, {"top_k": 3}, "model:torch")
+
+
+def test_normalize_question_only_collapses_whitespace():
+    assert normalize_question("  What is\tthe  TOTAL? ") == "What is the TOTAL?"
+
+
+def test_cache_key_separates_questions_pages_and_settings():
+    assert key(0, "What  is the total?") == key(0)
+    assert key(0, "what is the total") != key(0)
+    assert key(1) != key(0)
+    assert cache_key("doc", 0, "q", {"top_k": 1}, "m") != cache_key("doc", 0, "q", {"top_k": 3}, "m")
+    assert cache_key("doc", 0, "q", {}, "m:onnx") != cache_key("doc", 0, "q", {}, "m:torch")
+
+
+def test_round_trips_numpy_scores():
+    cache = AnswerCache()
+    cache.put(key(0), ANSWER)
+    assert cache.get(key(0)) == [{"score": 0.5, "answer": "x" * 40, "start": 1, "end": 2}]
+    assert cache.get(key(1)) is None
+
+
+def test_evicts_least_recently_used_within_budget():
+    cache = AnswerCache(max_bytes=300)
+    for page in range(3):
+        cache.put(key(page), ANSWER)
+        cache.get(key(0))
+    assert cache.bytes <= 300
+    assert cache.get(key(0)) is not None
+    assert cache.get(key(1)) is None
+
+
+def test_spills_evictions_to_disk_and_promotes_them_back(tmp_path):
+    path = str(tmp_path / "answers.sqlite3")
+    cache = AnswerCache(max_bytes=300, spill_path=path)
+    for page in range(5):
+        cache.put(key(page), ANSWER)
+    assert len(cache) < 5 and cache.spill_bytes > 0
+
+    spilled = cache.spill_bytes
+    assert cache.get(key(0)) is not None
+    # The promoted entry left disk; whatever it evicted took its place
+    rows = cache._spill.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+    assert rows == 5 - len(cache)
+    assert cache.spill_bytes == spilled
+
+    reopened = AnswerCache(max_bytes=300, spill_path=path)
+    assert reopened.spill_bytes == cache.spill_bytes
+
+
+def test_spill_is_capped(tmp_path):
+    cache = AnswerCache(
+        max_bytes=300, spill_path=str(tmp_path / "answers.sqlite3"), spill_max_bytes=400
+    )
+    for page in range(20):
+        cache.put(key(page), ANSWER)
+    assert 0 < cache.spill_bytes <= 400
+    assert cache.get(key(19)) is not None
+    assert cache.get(key(0)) is None
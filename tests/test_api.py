@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+api = pytest.importorskip("api", exc_type=ImportError)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from admission import AdmissionController  # noqa: E402
+from documents import Document, DocumentCache, content_hash  # noqa: E402
+from engine import PageResult  # noqa: E402
+
+
+class StubEngine:
+    """Engine stand-in: no model, no poppler, canned search results."""
+
+    def __init__(self, max_queued=8):
+        self.document_cache = DocumentCache()
+        self.search_admission = AdmissionController("search", 1, max_queued)
+
+    def ingest(self, data, name=None, progress=None):
+        if not data.startswith(b"%PDF"):
+            raise ValueError("not a PDF")
+        document = Document(content_hash(data), name, pages=[None, None], word_boxes=[[], []])
+        self.document_cache.put(document)
+        return document
+
+    def search(self, document, question, mode="quick", cancel=None, limit=None, ticket=None):
+        try:
+            ticket.wait(cancel)
+            yield PageResult(0, [{"page": 1, "answer": "42", "score": 0.9}], planned_pages=2)
+            yield PageResult(1, [], RuntimeError("bad page"), 2)
+        finally:
+            ticket.release()
+
+
+@pytest.fixture
+def stub_engine():
+    return StubEngine()
+
+
+@pytest.fixture
+def client(stub_engine):
+    with TestClient(api.create_app(stub_engine)) as client:
+        yield client
+
+
+def upload(client, data=b"%PDF-1.7 test"):
+    return client.post("/documents", params={"name": "test.pdf"}, content=data)
+
+
+def test_upload_and_describe(client):
+    response = upload(client)
+    assert response.status_code == 200
+    document = response.json()
+    assert document == {"doc_id": content_hash(b"%PDF-1.7 test"), "name": "test.pdf", "pages": 2}
+    assert client.get(f"/documents/{document['doc_id']}").json() == document
+
+
+def test_upload_errors(client):
+    assert upload(client, b"").status_code == 400
+    assert upload(client, b"plain text").status_code == 422
+
+
+def test_unknown_document_is_404(client):
+    assert client.get("/documents/missing").status_code == 404
+    assert client.post("/documents/missing/ask", json={"question": "q"}).status_code == 404
+
+
+def test_ask_streams_pages_then_sorted_answers(client, stub_engine):
+    doc_id = upload(client).json()["doc_id"]
+    response = client.post(f"/documents/{doc_id}/ask", json={"question": "What is it?"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [
+        {"page": 1, "answers": [{"page": 1, "answer": "42", "score": 0.9}]},
+        {"page": 2, "answers": [], "error": "bad page"},
+        {"done": True, "answers": [{"page": 1, "answer": "42", "score": 0.9}]},
+    ]
+    assert stub_engine.search_admission.active == 0
+
+
+def test_ask_is_shed_with_503_when_queue_is_full(client, stub_engine):
+    doc_id = upload(client).json()["doc_id"]
+    stub_engine.search_admission.max_queued = 0
+    held = stub_engine.search_admission.enter()
+    try:
+        response = client.post(f"/documents/{doc_id}/ask", json={"question": "q"})
+        assert response.status_code == 503
+    finally:
+        held.release()
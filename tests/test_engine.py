@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import pytest
+
+engine = pytest.importorskip("engine", exc_type=ImportError)
+
+from admission import AdmissionController  # noqa: E402
+from answer_cache import AnswerCache  # noqa: E402
+from documents import Document  # noqa: E402
+
+SCORES = [0.02, 0.03, 0.9, 0.04, 0.005, 0.5]
+
+
+def fake_answer_pages(pipe, question, pages, batch_size=8, bucket_batches=4, first_window=None,
+                      on_window=None, cancel=None, **kwargs):
+    # One chunk per page, windowed like inference.answer_pages
+    pages = iter(pages)
+    window_size = first_window or batch_size * bucket_batches
+    while True:
+        window = [page for _, page in zip(range(window_size), pages)]
+        if not window:
+            return
+        window_size = batch_size * bucket_batches
+        results = [
+            (i, [{"score": SCORES[i], "answer": f"answer {i}"}], None) for i, _ in window
+        ]
+        fake_answer_pages.windows.append([i for i, _ in window])
+        if on_window is not None:
+            on_window(results)
+        yield from results
+
+
+@pytest.fixture
+def qa_engine(monkeypatch):
+    fake_answer_pages.windows = []
+    monkeypatch.setattr(engine, "answer_pages", fake_answer_pages)
+    monkeypatch.setattr(engine.config, "BATCH_SIZE", 2)
+    monkeypatch.setattr(engine.config, "BUCKET_BATCHES", 2)
+    monkeypatch.setattr(engine.config, "RANKING", "none")
+    return engine.DocumentQAEngine(
+        SimpleNamespace(model=SimpleNamespace(name_or_path="model")),
+        answer_cache=AnswerCache(),
+        search_admission=AdmissionController("search", max_active=1),
+    )
+
+
+@pytest.fixture
+def document():
+    word_boxes = [[("word", [0, 0, 10, 10])] for _ in SCORES]
+    return Document("doc", "doc.pdf", pages=None, word_boxes=word_boxes)
+
+
+def test_answer_pages_keeps_planned_order_around_cache_hits(qa_engine, document):
+    qa_engine.answer_cache.put(
+        engine.cache_key("doc", 3, "q", engine.QUERY_KWARGS, qa_engine.model_id),
+        [{"score": 0.7, "answer": "cached"}]
+    )
+    planned = [5, 3, 0, 1, 2, 4]
+    results = list(qa_engine._answer_pages(document, "q", planned, engine.THOROUGH, None))
+    assert [i for i, _, _ in results] == planned
+    assert results[1][1] == [{"score": 0.7, "answer": "cached"}]
+    assert fake_answer_pages.windows == [[5, 0, 1, 2], [4]]
+
+
+def test_quick_search_stops_early_but_caches_the_whole_window(qa_engine, document):
+    results = list(qa_engine.search(document, "q", engine.QUICK))
+    # Page 2 is the first whose answer beats QUICK_STOP_SCORE
+    assert [result.page_index for result in results] == [0, 1, 2]
+    assert fake_answer_pages.windows == [[0], [1, 2]]
+    assert len(qa_engine.answer_cache) == 3
+    assert qa_engine.search_admission.active == 0
+
+    # The repeat is served from the cache without running the model
+    fake_answer_pages.windows = []
+    assert [r.page_index for r in qa_engine.search(document, " q ", engine.QUICK)] == [0, 1, 2]
+    assert fake_answer_pages.windows == []
+
+
+def test_search_drops_low_scores(qa_engine, document):
+    answers = qa_engine.ask(document, "q", engine.THOROUGH)
+    assert [answer["page"] for answer in answers] == [3, 6, 4, 2, 1]
+
+
+def test_thorough_search_degrades_to_quick_under_load(qa_engine, document, monkeypatch):
+    monkeypatch.setattr(engine.config, "DEGRADE_QUEUE_LENGTH", 1)
+    admission = qa_engine.search_admission
+    running, queued = admission.enter(), admission.enter()
+    # Arrives behind one queued search, then gets its slot
+    ticket = admission.enter()
+    running.release()
+    queued.release()
+
+    results = list(qa_engine.search(document, "q", engine.THOROUGH, ticket=ticket))
+    assert all(result.degraded for result in results)
+    assert [result.page_index for result in results] == [0, 1, 2]
@@ -0,0 +1,22 @@
+import ocr
+from ocr_store import OcrStore
+
+
+def fake_ocr_page(image, lang=None, tesseract_config=""):
+    if image == "bad":
+        raise RuntimeError("tesseract failed")
+    return [(image, [0, 0, 10, 10])]
+
+
+def test_ocr_pages_skips_failed_pages(monkeypatch):
+    monkeypatch.setattr(ocr, "ocr_page", fake_ocr_page)
+    results = list(ocr.ocr_pages(["a", "bad", "c"], workers=1))
+    assert results == [[("a", [0, 0, 10, 10])], [], [("c", [0, 0, 10, 10])]]
+
+
+def test_ocr_pages_does_not_store_failures(monkeypatch, tmp_path):
+    monkeypatch.setattr(ocr, "ocr_page", fake_ocr_page)
+    monkeypatch.setattr(ocr, "page_hash", lambda image: image)
+    store = OcrStore(str(tmp_path / "ocr.sqlite3"))
+    list(ocr.ocr_pages(["a", "bad"], workers=1, store=store))
+    assert len(store) == 1
@@ -0,0 +1,26 @@
+import pytest
+
+pdf_pages = pytest.importorskip("pdf_pages", exc_type=ImportError)
+
+
+def test_shard_page_range_aligns_to_chunks():
+    assert pdf_pages.shard_page_range(0, 10, 3, align=4) == [(0, 4), (4, 8), (8, 10)]
+    assert pdf_pages.shard_page_range(0, 10, 1) == [(0, 10)]
+    assert pdf_pages.shard_page_range(5, 5, 4) == []
+
+
+def test_iter_pages_renders_only_requested_runs(monkeypatch):
+    calls = []
+
+    def render_pages(source, first, last, dpi=None, size=None):
+        calls.append((first, last))
+        return [f"page {i}" for i in range(first - 1, last)]
+
+    monkeypatch.setattr(pdf_pages, "page_count", lambda source: 100)
+    monkeypatch.setattr(pdf_pages, "render_pages", render_pages)
+    pages = pdf_pages.LazyPages(None, cache_size=32, chunk_size=4, workers=1)
+
+    assert list(pages.iter_pages([0, 31, 32, 99])) == [
+        "page 0", "page 31", "page 32", "page 99"
+    ]
+    assert sorted(calls) == [(1, 1), (32, 33), (100, 100)]
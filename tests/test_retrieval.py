@@ -0,0 +1,46 @@
+from retrieval import Bm25Index, SemanticIndex, char_ngrams, fuse_rankings, tokenize
+
+
+def word_boxes(*pages):
+    return [[(word, [0, 0, 10, 10]) for word in page.split()] if page else None for page in pages]
+
+
+def test_tokenize_lowercases_words():
+    assert tokenize("Total: $1,200 DUE") == ["total", "1", "200", "due"]
+
+
+def test_bm25_ranks_matching_pages_first():
+    index = Bm25Index.from_word_boxes(word_boxes(
+        "the weather is nice",
+        "invoice total amount due",
+        "",
+        "total",
+    ))
+    assert index.rank("invoice total") == [1, 3, 0, 2]
+
+
+def test_bm25_rank_keeps_only_requested_pages_and_ties_in_order():
+    index = Bm25Index.from_word_boxes(word_boxes("a b", "c d", "e f"))
+    assert index.rank("nothing matches", [2, 0]) == [0, 2]
+
+
+def test_char_ngrams_pad_words():
+    assert char_ngrams("ab", (3, 3)) == [" ab", "ab "]
+
+
+def test_semantic_index_matches_inflections():
+    index = SemanticIndex.from_word_boxes(word_boxes(
+        "payment schedule and invoices",
+        "termination of the agreement by either party",
+        "signatures",
+    ))
+    assert index.rank("when can the contract be terminated")[0] == 1
+
+
+def test_semantic_index_handles_empty_documents():
+    assert SemanticIndex([]).rank("anything") == []
+    assert SemanticIndex(["", ""]).rank("anything") == [0, 1]
+
+
+def test_fuse_rankings_prefers_pages_ranked_high_by_both():
+    assert fuse_rankings([[0, 1, 2], [1, 2, 0]]) == [1, 0, 2]
@@ -0,0 +1,48 @@
+import pytest
+
+text_layer = pytest.importorskip("text_layer", exc_type=ImportError)
+
+BBOX_OUTPUT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml"><body><doc>
+<page width="200.0" height="100.0">
+<word xMin="20.0" yMin="10.0" xMax="60.0" yMax="20.0">Invoice</word>
+<word xMin="0" yMin="0" xMax="10" yMax="10"> </word>
+<word xMin="100.0" yMin="50.0" xMax="250.0" yMax="60.0">Total</word>
+</page>
+<page width="200.0" height="100.0"></page>
+</doc></body></html>"""
+
+
+class Source:
+    def __init__(self, output=None, error=None):
+        self.output = output
+        self.error = error
+
+    def run(self, command, options=(), trailing=()):
+        if self.error is not None:
+            raise self.error
+        return self.output
+
+
+def test_parse_bbox_output_normalizes_boxes():
+    assert text_layer.parse_bbox_output(BBOX_OUTPUT) == [
+        [("Invoice", [100, 100, 300, 200]), ("Total", [500, 500, 1000, 600])],
+        [],
+    ]
+
+
+def test_extract_word_boxes_marks_sparse_pages_for_ocr():
+    assert text_layer.extract_word_boxes(Source(BBOX_OUTPUT), 3, min_words=2) == [
+        [("Invoice", [100, 100, 300, 200]), ("Total", [500, 500, 1000, 600])],
+        None,
+        None,
+    ]
+
+
+@pytest.mark.parametrize("source", [
+    Source(error=text_layer.PopplerError("pdftotext failed")),
+    Source(b"not xml"),
+    Source(b"<html><page><word xMin='1'>a</word></page></html>"),
+])
+def test_extract_word_boxes_falls_back_to_ocr_on_unreadable_text_layer(source):
+    assert text_layer.extract_word_boxes(source, 2) == [None, None]
@@ -0,0 +1,56 @@
+"""Words and bounding boxes read from a PDF's embedded text layer."""
+from xml.etree import ElementTree
+
+from pdf_pages import PopplerError
+
+
+def _normalize(value, extent):
+    # LayoutLM expects coordinates on a 0-1000 grid, like apply_tesseract produces
+    return min(1000, max(0, int(1000 * value / extent)))
+
+
+def parse_bbox_output(output):
+    """Parse ``pdftotext -bbox`` XHTML into per-page ``word_boxes`` lists.
+
+    Each page becomes a list of ``(word, [x0, y0, x1, y1])`` pairs with
+    coordinates normalized to 0-1000, the format accepted by the
+    document-question-answering pipeline's ``word_boxes`` argument.
+    """
+    root = ElementTree.fromstring(output)
+    pages = []
+    for element in root.iter():
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag != "page":
+            continue
+        width = float(element.get("width"))
+        height = float(element.get("height"))
+        word_boxes = []
+        for word in element.iter():
+            if word.tag.rsplit("}", 1)[-1] != "word" or not (word.text or "").strip():
+                continue
+            word_boxes.append((word.text.strip(), [
+                _normalize(float(word.get("xMin")), width),
+                _normalize(float(word.get("yMin")), height),
+                _normalize(float(word.get("xMax")), width),
+                _normalize(float(word.get("yMax")), height),
+            ]))
+        pages.append(word_boxes)
+    return pages
+
+
+def extract_word_boxes(source, page_count, min_words=3):
+    """Return ``page_count`` entries: each page's word boxes, or ``None``.
+
+    Pages with fewer than ``min_words`` words in the text layer (typically
+    scanned pages) are reported as ``None`` so callers can fall back to OCR.
+    A document whose text layer cannot be read or parsed is treated as
+    having none, so every page falls back to OCR.
+    """
+    try:
+        output = source.run("pdftotext", ["-bbox"], trailing=["-"])
+        pages = parse_bbox_output(output)
+    except (PopplerError, ElementTree.ParseError, TypeError, ValueError, ZeroDivisionError):
+        # pdftotext failed, or its output lacks page sizes or word coordinates
+        pages = []
+    pages = pages[:page_count] + [[]] * (page_count - len(pages))
+    return [word_boxes if len(word_boxes) >= min_words else None for word_boxes in pages]